@@ -4,7 +4,7 @@ import sys
 import re
 
 class Arguments:
-    args: list[str] = []
+    args: list[str]
     program_path: str = ""
     output_path: str = ""
     skip_parsing: bool = False
@@ -36,12 +36,13 @@ class Arguments:
 
 class Lexer:
     src_text: str
-    tokens: list[str] = []
+    tokens: list[str]
 
     _is_comment = False
 
     def __init__(self, program_text: str):
         self.src_text = program_text
+        self.tokens = []
         self._scan()
 
     def _scan(self) -> None:
@@ -82,11 +83,12 @@ class ParamType(Enum):
 class SyntaxNode:
     code: int
     param_types: list[ParamType]
-    params: list[int] = []
+    params: list[int]
 
     def __init__(self, code: int, param_types: list[ParamType]):
         self.code = code
         self.param_types = param_types
+        self.params = []
 
 TokensMap: Dict[str, SyntaxNode] = {
     "WAIT": SyntaxNode(0x0FFF, []),
@@ -128,8 +130,8 @@ TokensMap: Dict[str, SyntaxNode] = {
 
 class Parser:
     tokens: list[str]
-    nodes: list[SyntaxNode] = []
-    labels: Dict[str, int] = {}
+    nodes: list[SyntaxNode]
+    labels: Dict[str, int]
 
     _current_action_token: str = ""
     _current_line: int = 0
@@ -138,6 +140,8 @@ class Parser:
 
     def __init__(self, tokens: list[str]):
         self.tokens = tokens
+        self.nodes = []
+        self.labels = {}
         self._create_nodes()
 
     def _create_nodes(self) -> None:
@@ -259,7 +263,7 @@ class Parser:
 
 
 class Generator:
-    _nodes: list[SyntaxNode] = []
+    _nodes: list[SyntaxNode]
 
     def __init__(self, nodes: list[SyntaxNode]):
         self._nodes = nodes
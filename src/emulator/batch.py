@@ -0,0 +1,131 @@
+import contextlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from main import Machine, CPU_DefaultClockSpeed
+
+Batch_RomExtension = ".ch8"
+Batch_DefaultFrames = 600
+Batch_ManifestCommentPrefix = "#"
+Batch_Seed = 0
+
+class BatchArguments:
+    args: list[str]
+    source_path: str
+    frames: int
+    cycles: int
+    workers: int
+    outpath: str
+    recompiler: bool
+
+    def __init__(self):
+        self._get_arguments()
+
+    def _get_arguments(self) -> None:
+        self.args = sys.argv[1:]
+        if len(self.args) == 0:
+            raise Exception("[ArgumentError] a ROM directory or a manifest is required")
+        self.source_path = self.args[0]
+        frames, has_frames = self._get_optional_argument("frames", str(Batch_DefaultFrames))
+        cycles, has_cycles = self._get_optional_argument("cycles", "0")
+        if has_frames and has_cycles:
+            raise Exception("[ArgumentError] --frames and --cycles cannot be used together")
+        self.frames = 0 if has_cycles else int(frames)
+        self.cycles = int(cycles)
+        workers, _ = self._get_optional_argument("workers", str(os.cpu_count() or 1))
+        self.workers = max(1, int(workers))
+        self.outpath, _ = self._get_optional_argument("outpath")
+        _, self.recompiler = self._get_optional_argument("recompiler")
+
+    def _get_optional_argument(self, flag: str, default_value: str = "") -> tuple[str, bool]:
+        for index, arg in enumerate(self.args):
+            if arg == f"--{flag}":
+                if index == len(self.args) - 1 or self.args[index + 1].startswith("--"):
+                    return (default_value, True)
+                return (self.args[index + 1], True)
+        return (default_value, False)
+
+def find_roms(source_path: str) -> list[str]:
+    if os.path.isdir(source_path):
+        return sorted(
+            os.path.join(source_path, name)
+            for name in os.listdir(source_path)
+            if name.lower().endswith(Batch_RomExtension)
+        )
+    if not os.path.isfile(source_path):
+        raise Exception(f"[BatchError] {source_path} is neither a directory nor a manifest")
+    root = os.path.dirname(source_path)
+    roms = []
+    with open(source_path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line == "" or line.startswith(Batch_ManifestCommentPrefix):
+                continue
+            roms.append(line if os.path.isabs(line) else os.path.join(root, line))
+    return roms
+
+def run_rom(job: tuple[str, int, int, bool]) -> dict:
+    path, frames, cycles, recompiler = job
+    result = {
+        "rom": path,
+        "instructions": 0,
+        "frames": 0,
+        "wall_time": 0.0,
+        "framebuffer_hash": None,
+        "unsupported_opcodes": [],
+        "out_of_bounds_accesses": 0,
+        "error": None,
+    }
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            run_machine(path, frames, cycles, recompiler, result)
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+def run_machine(path: str, frames: int, cycles: int, recompiler: bool, result: dict) -> None:
+    machine = Machine(recompiler=recompiler, clock_speed=CPU_DefaultClockSpeed, seed=Batch_Seed)
+    machine.load_rom_file(path)
+    start = time.perf_counter()
+    if cycles > 0:
+        while result["instructions"] < cycles:
+            result["instructions"] += machine.cpu.run_frame()
+            result["frames"] += 1
+    else:
+        result["instructions"] = machine.run_frames(frames)
+        result["frames"] = frames
+    result["wall_time"] = time.perf_counter() - start
+    result["framebuffer_hash"] = machine.display.get_hash()
+    result["unsupported_opcodes"] = [
+        hex(opcode) for opcode in machine.cpu.get_opcode_table().get_unsupported_opcodes()
+    ]
+    result["out_of_bounds_accesses"] = machine.memory.get_out_of_bounds_count()
+
+def run_batch(roms: list[str], frames: int, cycles: int, workers: int, recompiler: bool) -> dict:
+    jobs = [(path, frames, cycles, recompiler) for path in roms]
+    start = time.perf_counter()
+    with multiprocessing.Pool(min(workers, max(1, len(jobs)))) as pool:
+        results = pool.map(run_rom, jobs)
+    return {
+        "frames": frames,
+        "cycles": cycles,
+        "workers": workers,
+        "recompiler": recompiler,
+        "wall_time": time.perf_counter() - start,
+        "roms": results,
+    }
+
+if __name__ == "__main__":
+    arguments = BatchArguments()
+    roms = find_roms(arguments.source_path)
+    report = run_batch(roms, arguments.frames, arguments.cycles, arguments.workers, arguments.recompiler)
+    output = json.dumps(report, indent=2)
+    if arguments.outpath:
+        with open(arguments.outpath, "w") as f:
+            f.write(output)
+        print(f"[Batch] {len(roms)} ROMs in {round(report['wall_time'], 3)}s written to {arguments.outpath}")
+    else:
+        print(output)
@@ -0,0 +1,238 @@
+import contextlib
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import time
+
+from main import Machine
+from lockstep import LockstepEngine, np
+
+Benchmark_DefaultInstructions = 200_000
+Benchmark_DefaultThreshold = 0.25
+Benchmark_Repeats = 3
+Benchmark_Seed = 0
+Benchmark_LockstepMachines = 4096
+Benchmark_CompilerLines = 20_000
+Benchmark_RootPath = os.path.join(os.path.dirname(__file__), "..", "..")
+Benchmark_RomsPath = os.path.join(Benchmark_RootPath, "assets", "roms")
+Benchmark_CompilerPath = os.path.join(Benchmark_RootPath, "src", "compiler", "main.py")
+Benchmark_SyntheticRom = bytes([
+    0x60, 0x05, # LD V0, 5
+    0x61, 0x03, # LD V1, 3
+    0x80, 0x14, # ADD_REG V0, V1
+    0x80, 0x12, # AND V0, V1
+    0x70, 0x01, # ADD V0, 1
+    0xA3, 0x00, # LD_I 0x300
+    0xF0, 0x1E, # ADD_I_VX V0
+    0xF0, 0x33, # LD_B V0
+    0xF2, 0x65, # LD_V_TO_I V2
+    0xF1, 0x55, # LD_I_TO_V V1
+    0xF0, 0x07, # LD_VX_DT V0
+    0x30, 0x05, # SE V0, 5
+    0x12, 0x00, # JP 0x200
+])
+Benchmark_ArithmeticRom = bytes([
+    0x60, 0x00, # LD V0, 0
+    0x70, 0x01, # ADD V0, 1
+    0x81, 0x04, # ADD_REG V1, V0
+    0x82, 0x13, # XOR V2, V1
+    0x83, 0x22, # AND V3, V2
+    0x84, 0x31, # OR V4, V3
+    0x85, 0x45, # SUB V5, V4
+    0x86, 0x50, # LD_REG V6, V5
+    0x87, 0x64, # ADD_REG V7, V6
+    0x88, 0x76, # SHR V8, V7
+    0xA3, 0x00, # LD_I 0x300
+    0xF8, 0x1E, # ADD_I_VX V8
+    0xF3, 0x65, # LD_V_TO_I V3
+    0x40, 0x40, # SNE V0, 0x40
+    0x12, 0x00, # JP 0x200
+    0x12, 0x02, # JP 0x202
+])
+Benchmark_MicroRoms = {
+    "alu_8xy": bytes([
+        0x60, 0x05, # LD V0, 5
+        0x61, 0x03, # LD V1, 3
+        0x80, 0x10, # LD_REG V0, V1
+        0x80, 0x11, # OR V0, V1
+        0x80, 0x12, # AND V0, V1
+        0x80, 0x13, # XOR V0, V1
+        0x80, 0x14, # ADD_REG V0, V1
+        0x80, 0x15, # SUB V0, V1
+        0x80, 0x16, # SHR V0
+        0x80, 0x17, # SUBN V0, V1
+        0x80, 0x1E, # SHL V0
+        0x12, 0x00, # JP 0x200
+    ]),
+    "dxyn": bytes([
+        0xA2, 0x0C, # LD_I 0x20C
+        0xD0, 0x15, # DRW V0, V1, 5
+        0x70, 0x03, # ADD V0, 3
+        0x71, 0x02, # ADD V1, 2
+        0x12, 0x02, # JP 0x202
+        0x00, 0x00,
+        0xF0, 0x90, 0x90, 0x90, 0xF0,
+    ]),
+    "fx55_fx65": bytes([
+        0xA3, 0x00, # LD_I 0x300
+        0xF7, 0x55, # LD_I_TO_V V7
+        0x70, 0x01, # ADD V0, 1
+        0xF7, 0x65, # LD_V_TO_I V7
+        0x12, 0x00, # JP 0x200
+    ]),
+    "jumps_calls": bytes([
+        0x22, 0x06, # CALL 0x206
+        0x12, 0x04, # JP 0x204
+        0x12, 0x00, # JP 0x200
+        0x00, 0xEE, # RET
+    ]),
+}
+Benchmark_CompilerProgram = [
+    "LD v0, 0x05 # counter",
+    "LD v1, 0b0011",
+    "ADD_REG v0, v1",
+    "SE v0, 10",
+    "LD_I 0x300",
+    "DRW v0, v1, 5",
+    "CALL main",
+    "JP main",
+]
+
+class BenchmarkArguments:
+    args: list[str]
+    instructions: int
+    outpath: str
+    baseline_path: str
+    threshold: float
+
+    def __init__(self):
+        self._get_arguments()
+
+    def _get_arguments(self) -> None:
+        self.args = sys.argv[1:]
+        instructions, _ = self._get_optional_argument("instructions", str(Benchmark_DefaultInstructions))
+        self.instructions = int(instructions)
+        self.outpath, _ = self._get_optional_argument("outpath")
+        self.baseline_path, _ = self._get_optional_argument("baseline")
+        threshold, _ = self._get_optional_argument("threshold", str(Benchmark_DefaultThreshold))
+        self.threshold = float(threshold)
+
+    def _get_optional_argument(self, flag: str, default_value: str = "") -> tuple[str, bool]:
+        for index, arg in enumerate(self.args):
+            if arg == f"--{flag}":
+                if index == len(self.args) - 1 or self.args[index + 1].startswith("--"):
+                    return (default_value, True)
+                return (self.args[index + 1], True)
+        return (default_value, False)
+
+def load_rom(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+def load_compiler():
+    spec = importlib.util.spec_from_file_location("chip8_compiler", Benchmark_CompilerPath)
+    compiler = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(compiler)
+    return compiler
+
+def best_of(measure) -> float:
+    return max(measure() for _ in range(Benchmark_Repeats))
+
+def run(rom: bytes, instructions: int, recompiler: bool, aot_cache_path: str | None = None) -> float:
+    machine = Machine(recompiler=recompiler, seed=Benchmark_Seed, aot_cache_path=aot_cache_path)
+    machine.load_rom(rom)
+    executed = 0
+    start = time.perf_counter()
+    while executed < instructions:
+        executed += machine.cpu.step()
+    return executed / (time.perf_counter() - start)
+
+def run_lockstep(rom: bytes, instructions: int) -> float:
+    engine = LockstepEngine(Benchmark_LockstepMachines)
+    engine.load_rom(rom)
+    start = time.perf_counter()
+    while engine.executed < instructions:
+        engine.step()
+    return engine.executed / (time.perf_counter() - start)
+
+def generate_program(lines: int) -> str:
+    program = ["main:"]
+    for index in range(lines):
+        program.append(Benchmark_CompilerProgram[index % len(Benchmark_CompilerProgram)])
+    return "\n".join(program) + "\n"
+
+def run_compiler(compiler, program: str, lines: int) -> dict[str, float]:
+    start = time.perf_counter()
+    lexer = compiler.Lexer(program)
+    lexed = time.perf_counter()
+    parser = compiler.Parser(lexer.tokens)
+    parsed = time.perf_counter()
+    with contextlib.redirect_stdout(None):
+        compiler.Generator(parser.nodes).create_rom(os.devnull)
+    generated = time.perf_counter()
+    return {
+        "lexer": lines / (lexed - start),
+        "parser": lines / (parsed - lexed),
+        "generator": lines / (generated - parsed),
+    }
+
+def get_reference_roms() -> dict[str, bytes]:
+    roms = {name: load_rom(os.path.join(Benchmark_RomsPath, name)) for name in sorted(os.listdir(Benchmark_RomsPath)) if name.endswith(".ch8")}
+    roms["synthetic"] = Benchmark_SyntheticRom
+    roms["arithmetic"] = Benchmark_ArithmeticRom
+    return roms
+
+def run_suite(instructions: int) -> dict[str, float]:
+    results: dict[str, float] = {}
+    aot_cache = tempfile.TemporaryDirectory()
+    modes = [("interpreter", False, None), ("recompiler", True, None), ("aot", False, aot_cache.name)]
+    for mode, recompiler, aot_cache_path in modes:
+        for name, rom in Benchmark_MicroRoms.items():
+            results[f"micro.{mode}.{name}"] = best_of(lambda: run(rom, instructions, recompiler, aot_cache_path))
+    reference_roms = get_reference_roms()
+    for mode, recompiler, aot_cache_path in modes:
+        for name, rom in reference_roms.items():
+            results[f"macro.{mode}.{name}"] = best_of(lambda: run(rom, instructions, recompiler, aot_cache_path))
+    aot_cache.cleanup()
+    if np is not None:
+        for name, rom in reference_roms.items():
+            results[f"macro.lockstep.{name}"] = best_of(lambda: run_lockstep(rom, instructions * 10))
+    compiler = load_compiler()
+    program = generate_program(Benchmark_CompilerLines)
+    runs = [run_compiler(compiler, program, Benchmark_CompilerLines) for _ in range(Benchmark_Repeats)]
+    for stage in runs[0]:
+        results[f"compiler.{stage}"] = max(run[stage] for run in runs)
+    return results
+
+def compare(results: dict[str, float], baseline: dict[str, float], threshold: float) -> list[str]:
+    regressions = []
+    for name, value in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            print(f"[Benchmark] {name}: {round(value)}/sec (no baseline)")
+            continue
+        change = value / reference - 1
+        print(f"[Benchmark] {name}: {round(value)}/sec ({change:+.1%} vs baseline)")
+        if change < -threshold:
+            regressions.append(name)
+    return regressions
+
+if __name__ == "__main__":
+    arguments = BenchmarkArguments()
+    results = run_suite(arguments.instructions)
+    report = {"instructions": arguments.instructions, "results": results}
+    if arguments.outpath:
+        with open(arguments.outpath, "w") as f:
+            json.dump(report, f, indent=2)
+    if not arguments.baseline_path:
+        for name, value in results.items():
+            print(f"[Benchmark] {name}: {round(value)}/sec")
+        sys.exit(0)
+    with open(arguments.baseline_path, "r") as f:
+        baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, arguments.threshold)
+    for name in regressions:
+        print(f"[Benchmark Error]: {name} regressed by more than {arguments.threshold:.0%}.")
+    sys.exit(1 if regressions else 0)
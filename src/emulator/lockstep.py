@@ -0,0 +1,388 @@
+from typing import Callable
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from main import (
+    CPU, Memory, Display, Inputs,
+    Registers_VLength, Registers_StackLength, Registers_FirstProgramCounterAdress,
+    Memory_DataSize, Memory_FontsetData, Memory_FontSetFirstAddress,
+    Display_PixelOnWidth, Display_PixelOnHeight, Display_SpriteWidth,
+    CPU_TimerFrequency, CPU_DefaultClockSpeed, CPU_OmitIncrementProgramCounterOpcodes,
+    OpcodeTable_Size, Quirks_DefaultProfile,
+    Opcode_0x00E0, Opcode_0x00EE, Opcode_0x1000, Opcode_0x2000, Opcode_0x3000,
+    Opcode_0x4000, Opcode_0x5000, Opcode_0x6000, Opcode_0x7000, Opcode_0x8000,
+    Opcode_0x8001, Opcode_0x8002, Opcode_0x8003, Opcode_0x8004, Opcode_0x8005,
+    Opcode_0x8006, Opcode_0x8007, Opcode_0x800E, Opcode_0x9000, Opcode_0xA000,
+    Opcode_0xB000, Opcode_0xC000, Opcode_0xD000, Opcode_0xE09E, Opcode_0xE0A1,
+    Opcode_0xF007, Opcode_0xF00A, Opcode_0xF015, Opcode_0xF018, Opcode_0xF01E,
+    Opcode_0xF029, Opcode_0xF033, Opcode_0xF055, Opcode_0xF065,
+    Opcode_0x8001_ResetVF, Opcode_0x8002_ResetVF, Opcode_0x8003_ResetVF,
+    Opcode_0x8006_InPlace, Opcode_0x800E_InPlace, Opcode_0xB000_VX,
+    Opcode_0xF055_AddX, Opcode_0xF055_AddXPlusOne, Opcode_0xF065_AddX, Opcode_0xF065_AddXPlusOne,
+)
+
+Lockstep_SeedMultiplier = 0x9E3779B97F4A7C15
+Lockstep_RowsMask = (1 << Display_PixelOnWidth) - 1
+
+def require_numpy() -> None:
+    if np is None:
+        raise Exception("[BackendError] numpy is required by the lockstep engine")
+
+# Runs many machines on the same ROM, one instruction per machine per step.
+# State lives in NumPy arrays whose first dimension is the machine index, and
+# each step executes every opcode family present once, on the machines that
+# fetched it. Memory is stored as bytes, so values written by FX33/FX55 are
+# masked to 8 bits.
+class LockstepEngine:
+    count: int
+    executed: int = 0
+
+    v: "np.ndarray"
+    i: "np.ndarray"
+    pc: "np.ndarray"
+    sp: "np.ndarray"
+    dt: "np.ndarray"
+    st: "np.ndarray"
+    stack: "np.ndarray"
+    memory: "np.ndarray"
+    rows: "np.ndarray"
+    keys: "np.ndarray"
+
+    _rng_state: "np.ndarray"
+    _machines: "np.ndarray"
+    _opcode_handlers: "np.ndarray"
+    _increments_pc: "np.ndarray"
+    _vector_ops: list[Callable[["np.ndarray", "np.ndarray"], None] | None]
+
+    _instructions_per_frame: float
+    _instruction_budget: float = 0.0
+
+    def __init__(
+        self,
+        count: int,
+        seeds: list[int] | None = None,
+        clock_speed: float = CPU_DefaultClockSpeed,
+        quirks: str = Quirks_DefaultProfile
+    ):
+        require_numpy()
+        self.count = count
+        self.v = np.zeros((count, Registers_VLength), dtype=np.int64)
+        self.i = np.zeros(count, dtype=np.int64)
+        self.pc = np.full(count, Registers_FirstProgramCounterAdress, dtype=np.int64)
+        self.sp = np.full(count, -1, dtype=np.int64)
+        self.dt = np.zeros(count, dtype=np.int64)
+        self.st = np.zeros(count, dtype=np.int64)
+        self.stack = np.zeros((count, Registers_StackLength), dtype=np.int64)
+        self.memory = np.zeros((count, Memory_DataSize), dtype=np.uint8)
+        self.rows = np.zeros((count, Display_PixelOnHeight), dtype=np.uint64)
+        self.keys = np.zeros((count, 0x10), dtype=bool)
+        self._machines = np.arange(count)
+        self._instructions_per_frame = clock_speed / CPU_TimerFrequency
+
+        fontset_end = Memory_FontSetFirstAddress + len(Memory_FontsetData)
+        self.memory[:, Memory_FontSetFirstAddress:fontset_end] = Memory_FontsetData
+
+        seeds = np.array(seeds if seeds is not None else range(count), dtype=np.uint64)
+        self._rng_state = (seeds + np.uint64(1)) * np.uint64(Lockstep_SeedMultiplier)
+
+        self._init_opcode_handlers(quirks)
+
+    def _init_opcode_handlers(self, quirks: str) -> None:
+        vector_ops = {
+            Opcode_0x00E0: self._op_00E0, Opcode_0x00EE: self._op_00EE,
+            Opcode_0x1000: self._op_1000, Opcode_0x2000: self._op_2000,
+            Opcode_0x3000: self._op_3000, Opcode_0x4000: self._op_4000,
+            Opcode_0x5000: self._op_5000, Opcode_0x6000: self._op_6000,
+            Opcode_0x7000: self._op_7000, Opcode_0x8000: self._op_8000,
+            Opcode_0x8001: self._op_8001, Opcode_0x8002: self._op_8002,
+            Opcode_0x8003: self._op_8003, Opcode_0x8004: self._op_8004,
+            Opcode_0x8005: self._op_8005, Opcode_0x8006: self._op_8006,
+            Opcode_0x8007: self._op_8007, Opcode_0x800E: self._op_800E,
+            Opcode_0x9000: self._op_9000, Opcode_0xA000: self._op_A000,
+            Opcode_0xB000: self._op_B000, Opcode_0xC000: self._op_C000,
+            Opcode_0xD000: self._op_D000, Opcode_0xE09E: self._op_E09E,
+            Opcode_0xE0A1: self._op_E0A1, Opcode_0xF007: self._op_F007,
+            Opcode_0xF00A: self._op_F00A, Opcode_0xF015: self._op_F015,
+            Opcode_0xF018: self._op_F018, Opcode_0xF01E: self._op_F01E,
+            Opcode_0xF029: self._op_F029, Opcode_0xF033: self._op_F033,
+            Opcode_0xF055: self._op_F055, Opcode_0xF065: self._op_F065,
+            Opcode_0x8001_ResetVF: self._op_8001_reset_vf, Opcode_0x8002_ResetVF: self._op_8002_reset_vf,
+            Opcode_0x8003_ResetVF: self._op_8003_reset_vf, Opcode_0x8006_InPlace: self._op_8006_in_place,
+            Opcode_0x800E_InPlace: self._op_800E_in_place, Opcode_0xB000_VX: self._op_B000_vx,
+            Opcode_0xF055_AddX: self._op_F055_add_x, Opcode_0xF055_AddXPlusOne: self._op_F055_add_x_plus_one,
+            Opcode_0xF065_AddX: self._op_F065_add_x, Opcode_0xF065_AddXPlusOne: self._op_F065_add_x_plus_one,
+        }
+        dispatch = CPU(Memory(), Display(), Inputs(), quirks=quirks).get_opcode_table().get_dispatch()
+        callbacks: list[Callable] = []
+        handlers = [0] * OpcodeTable_Size
+        for opcode, entry in enumerate(dispatch):
+            if opcode and entry:
+                if entry.callback not in callbacks:
+                    if entry.callback not in vector_ops:
+                        raise Exception(f"[LockstepError] {entry.callback.__name__} has no vectorized implementation")
+                    callbacks.append(entry.callback)
+                handlers[opcode] = callbacks.index(entry.callback) + 1
+
+        self._opcode_handlers = np.array(handlers, dtype=np.int64)
+        self._vector_ops = [None] + [vector_ops[callback] for callback in callbacks]
+        opcodes = np.arange(OpcodeTable_Size)
+        self._increments_pc = ~np.isin(opcodes & 0xF000, CPU_OmitIncrementProgramCounterOpcodes)
+
+    def _random(self, machines: "np.ndarray") -> "np.ndarray":
+        state = self._rng_state[machines]
+        state ^= state << np.uint64(13)
+        state ^= state >> np.uint64(7)
+        state ^= state << np.uint64(17)
+        self._rng_state[machines] = state
+        return ((state >> np.uint64(32)) & np.uint64(0xFF)).astype(np.int64)
+
+    def _skip(self, machines: "np.ndarray", condition: "np.ndarray") -> None:
+        self.pc[machines] += np.where(condition, 2, 0)
+
+    def _op_00E0(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        self.rows[m] = 0
+
+    def _op_00EE(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        sp = self.sp[m]
+        has_frame = sp > 0
+        self.sp[m] = np.where(has_frame, sp - 1, sp)
+        self.pc[m] = self.stack[m, np.where(has_frame, sp - 1, 0)]
+
+    def _op_1000(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        self.pc[m] = op & 0xFFF
+
+    def _op_2000(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        sp = self.sp[m] + 1
+        self.sp[m] = sp
+        self.stack[m, sp] = self.pc[m]
+        self.pc[m] = op & 0xFFF
+
+    def _op_3000(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        self._skip(m, self.v[m, (op >> 8) & 0xF] == (op & 0xFF))
+
+    def _op_4000(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        self._skip(m, self.v[m, (op >> 8) & 0xF] != (op & 0xFF))
+
+    def _op_5000(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        self._skip(m, self.v[m, (op >> 8) & 0xF] == self.v[m, (op >> 4) & 0xF])
+
+    def _op_6000(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        self.v[m, (op >> 8) & 0xF] = op & 0xFF
+
+    def _op_7000(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        x = (op >> 8) & 0xF
+        self.v[m, x] = (self.v[m, x] + (op & 0xFF)) & 0xFF
+
+    def _op_8000(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        self.v[m, (op >> 8) & 0xF] = self.v[m, (op >> 4) & 0xF]
+
+    def _op_8001(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        x = (op >> 8) & 0xF
+        self.v[m, x] = self.v[m, x] | self.v[m, (op >> 4) & 0xF]
+
+    def _op_8002(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        x = (op >> 8) & 0xF
+        self.v[m, x] = self.v[m, x] & self.v[m, (op >> 4) & 0xF]
+
+    def _op_8003(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        x = (op >> 8) & 0xF
+        self.v[m, x] = self.v[m, x] ^ self.v[m, (op >> 4) & 0xF]
+
+    def _op_8004(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        x = (op >> 8) & 0xF
+        result = self.v[m, x] + self.v[m, (op >> 4) & 0xF]
+        self.v[m, 0xF] = result > 255
+        self.v[m, x] = result & 0xFF
+
+    def _op_8005(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        x = (op >> 8) & 0xF
+        y = (op >> 4) & 0xF
+        self.v[m, 0xF] = self.v[m, x] > self.v[m, y]
+        self.v[m, x] = self.v[m, x] - self.v[m, y]
+
+    def _op_8006(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        x = (op >> 8) & 0xF
+        self.v[m, x] = self.v[m, (op >> 4) & 0xF]
+        self.v[m, 0xF] = self.v[m, x] & 1
+        self.v[m, x] = self.v[m, x] >> 1
+
+    def _op_8007(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        x = (op >> 8) & 0xF
+        y = (op >> 4) & 0xF
+        self.v[m, 0xF] = self.v[m, y] > self.v[m, x]
+        self.v[m, x] = self.v[m, y] - self.v[m, x]
+
+    def _op_800E(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        x = (op >> 8) & 0xF
+        self.v[m, x] = self.v[m, (op >> 4) & 0xF]
+        self.v[m, 0xF] = (self.v[m, x] & 0x80) >> 7
+        self.v[m, x] = self.v[m, x] << 1
+
+    def _op_8001_reset_vf(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        self._op_8001(m, op)
+        self.v[m, 0xF] = 0
+
+    def _op_8002_reset_vf(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        self._op_8002(m, op)
+        self.v[m, 0xF] = 0
+
+    def _op_8003_reset_vf(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        self._op_8003(m, op)
+        self.v[m, 0xF] = 0
+
+    def _op_8006_in_place(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        x = (op >> 8) & 0xF
+        self.v[m, 0xF] = self.v[m, x] & 1
+        self.v[m, x] = self.v[m, x] >> 1
+
+    def _op_800E_in_place(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        x = (op >> 8) & 0xF
+        self.v[m, 0xF] = (self.v[m, x] & 0x80) >> 7
+        self.v[m, x] = self.v[m, x] << 1
+
+    def _op_9000(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        self._skip(m, self.v[m, (op >> 8) & 0xF] != self.v[m, (op >> 4) & 0xF])
+
+    def _op_A000(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        self.i[m] = op & 0xFFF
+
+    def _op_B000(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        self.pc[m] = (op & 0xFFF) + self.v[m, 0]
+
+    def _op_B000_vx(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        self.pc[m] = (op & 0xFFF) + self.v[m, (op >> 8) & 0xF]
+
+    def _op_C000(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        self.v[m, (op >> 8) & 0xF] = self._random(m) & (op & 0xFF)
+
+    def _op_D000(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        shift = (self.v[m, (op >> 8) & 0xF] % Display_PixelOnWidth).astype(np.uint64)
+        back_shift = (np.uint64(Display_PixelOnWidth) - shift) % np.uint64(Display_PixelOnWidth)
+        y = self.v[m, (op >> 4) & 0xF]
+        height = op & 0xF
+        collision = np.zeros(len(m), dtype=bool)
+        for row in range(int(height.max(initial=0))):
+            addr = self.i[m] + row
+            readable = (row < height) & (addr >= 0) & (addr < Memory_DataSize)
+            sprite_row = np.where(readable, self.memory[m, np.where(readable, addr, 0)], 0).astype(np.uint64)
+            line = sprite_row << np.uint64(Display_PixelOnWidth - Display_SpriteWidth)
+            line = ((line >> shift) | (line << back_shift)) & np.uint64(Lockstep_RowsMask)
+            row_y = (y + row) % Display_PixelOnHeight
+            current = self.rows[m, row_y]
+            collision |= (current & line) != 0
+            self.rows[m, row_y] = current ^ line
+        self.v[m, 0xF] = collision
+
+    def _op_E09E(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        self._skip(m, self.keys[m, self.v[m, (op >> 8) & 0xF] & 0x0F])
+
+    def _op_E0A1(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        self._skip(m, ~self.keys[m, self.v[m, (op >> 8) & 0xF] & 0x0F])
+
+    def _op_F007(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        self.v[m, (op >> 8) & 0xF] = self.dt[m]
+
+    def _op_F00A(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        keys = self.keys[m]
+        pressed = keys.any(axis=1)
+        self.v[m[pressed], ((op >> 8) & 0xF)[pressed]] = keys[pressed].argmax(axis=1)
+        self.pc[m[~pressed]] -= 2
+
+    def _op_F015(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        self.dt[m] = self.v[m, (op >> 8) & 0xF]
+
+    def _op_F018(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        self.st[m] = self.v[m, (op >> 8) & 0xF]
+
+    def _op_F01E(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        self.i[m] += self.v[m, (op >> 8) & 0xF]
+
+    def _op_F029(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        self.i[m] = (self.v[m, (op >> 8) & 0xF] & 0x0F) * 5
+
+    def _op_F033(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        value = self.v[m, (op >> 8) & 0xF]
+        addr = self.i[m]
+        writable = (addr >= 0) & (addr + 3 <= Memory_DataSize)
+        m, value, addr = m[writable], value[writable], addr[writable]
+        self.memory[m, addr] = (value // 100) & 0xFF
+        self.memory[m, addr + 1] = ((value % 100) // 10) & 0xFF
+        self.memory[m, addr + 2] = (value % 10) & 0xFF
+
+    def _op_F055(self, m: "np.ndarray", op: "np.ndarray", index_offset: int | None = None) -> None:
+        x = (op >> 8) & 0xF
+        for register in range(int(x.max(initial=0)) + 1):
+            addr = self.i[m] + register
+            writable = (register <= x) & (addr >= 0) & (addr < Memory_DataSize)
+            self.memory[m[writable], addr[writable]] = self.v[m[writable], register] & 0xFF
+        if index_offset is not None:
+            self.i[m] += x + index_offset
+
+    def _op_F065(self, m: "np.ndarray", op: "np.ndarray", index_offset: int | None = None) -> None:
+        x = (op >> 8) & 0xF
+        for register in range(int(x.max(initial=0)) + 1):
+            addr = self.i[m] + register
+            active = register <= x
+            readable = active & (addr >= 0) & (addr < Memory_DataSize)
+            values = np.where(readable, self.memory[m, np.where(readable, addr, 0)], 0)
+            self.v[m[active], register] = values[active]
+        if index_offset is not None:
+            self.i[m] += x + index_offset
+
+    def _op_F055_add_x(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        self._op_F055(m, op, 0)
+
+    def _op_F055_add_x_plus_one(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        self._op_F055(m, op, 1)
+
+    def _op_F065_add_x(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        self._op_F065(m, op, 0)
+
+    def _op_F065_add_x_plus_one(self, m: "np.ndarray", op: "np.ndarray") -> None:
+        self._op_F065(m, op, 1)
+
+    def load_rom(self, rom: bytes) -> None:
+        end = Registers_FirstProgramCounterAdress + len(rom)
+        self.memory[:, Registers_FirstProgramCounterAdress:end] = np.frombuffer(rom, dtype=np.uint8)
+
+    def set_key(self, machine: int, key: int, pressed: bool) -> None:
+        self.keys[machine, key] = pressed
+
+    def get_rows(self, machine: int) -> list[int]:
+        return [int(row) for row in self.rows[machine]]
+
+    def step(self) -> None:
+        pc = self.pc
+        fetchable = (pc >= 0) & (pc + 1 < Memory_DataSize)
+        fetch_pc = np.where(fetchable, pc, 0)
+        high = self.memory[self._machines, fetch_pc].astype(np.int64)
+        low = self.memory[self._machines, fetch_pc + 1].astype(np.int64)
+        opcodes = np.where(fetchable, (high << 8) | low, 0)
+        handlers = self._opcode_handlers[opcodes]
+        increments = self._increments_pc[opcodes]
+
+        handler_counts = np.bincount(handlers, minlength=len(self._vector_ops))
+        for handler in np.flatnonzero(handler_counts[1:]) + 1:
+            if handler_counts[handler] == self.count:
+                machines = self._machines
+            else:
+                machines = np.flatnonzero(handlers == handler)
+            self._vector_ops[handler](machines, opcodes[machines])
+
+        self.pc[increments] += 2
+        self.executed += self.count
+
+    def run(self, steps: int) -> None:
+        for _ in range(steps):
+            self.step()
+
+    def run_frame(self) -> None:
+        self._instruction_budget += self._instructions_per_frame
+        steps = int(self._instruction_budget)
+        self.run(steps)
+        self._instruction_budget -= steps
+        self.dt = np.maximum(self.dt - 1, 0)
+        self.st = np.maximum(self.st - 1, 0)
@@ -1,11 +1,29 @@
+from __future__ import annotations
+from array import array
+from collections import deque
 from dataclasses import dataclass
 from typing import NewType, Callable
-import pygame
 import random
 import math
+import operator
+import re
 import time
+import json
+import csv
+import struct
+import zlib
+import hashlib
+import importlib.util
+import os
 import sys
 
+# pygame greets on stdout when imported, which would corrupt reports the tools write there.
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+try:
+    import pygame
+except ImportError:
+    pygame = None
+
 Uint8 = NewType("Uint8", int)
 Uint16 = NewType("Uint16", int)
 
@@ -18,15 +36,29 @@ Registers_StackLength = 0x10
 Registers_FirstProgramCounterAdress = 0x200
 
 class Registers:
-    v: list[Uint8] = [0] * Registers_VLength
-    i: Uint16 = 0
-    pc: Uint16 = Registers_FirstProgramCounterAdress
-    sp: Uint8 = -1
-    dt: Uint8 = 0
-    st: Uint8 = 0
-    stack: list[Uint16] = [0] * Registers_StackLength
-
-Memory_DataSize = 0xFFF
+    v: list[Uint8]
+    i: Uint16
+    pc: Uint16
+    sp: Uint8
+    dt: Uint8
+    st: Uint8
+    stack: list[Uint16]
+
+    def __init__(self):
+        self.v = [0] * Registers_VLength
+        self.i = 0
+        self.pc = Registers_FirstProgramCounterAdress
+        self.sp = -1
+        self.dt = 0
+        self.st = 0
+        self.stack = [0] * Registers_StackLength
+
+Memory_DataSize = 0x1000
+Memory_AddressMask = Memory_DataSize - 1
+Memory_BoundsWrap = "wrap"
+Memory_BoundsTrap = "trap"
+Memory_BoundsCount = "count"
+Memory_BoundsPolicies = [Memory_BoundsWrap, Memory_BoundsTrap, Memory_BoundsCount]
 Memory_FontsetData = [
     0xF0, 0x90, 0x90, 0x90, 0xF0,
     0x20, 0x60, 0x20, 0x20, 0x70,
@@ -48,34 +80,128 @@ Memory_FontsetData = [
 Memory_FontSetFirstAddress = 0x0
 
 class Memory:
-    _data: list[Uint8] = [0] * Memory_DataSize
-
-    def __init__(self):
+    _data: bytearray
+    _view: memoryview
+    _write_listeners: list[Callable[[Uint16, int], None]]
+    _read_listeners: list[Callable[[Uint16, int], None]]
+    _bounds_policy: str
+    _out_of_bounds_count: int
+
+    def __init__(self, bounds_policy: str = Memory_BoundsCount):
+        if bounds_policy not in Memory_BoundsPolicies:
+            raise Exception(f"[MemoryError] unknown bounds policy '{bounds_policy}'")
+        self._data = bytearray(Memory_DataSize)
+        self._view = memoryview(self._data)
+        self._write_listeners = []
+        self._read_listeners = []
+        self._bounds_policy = bounds_policy
+        self._out_of_bounds_count = 0
         self._load_fontset()
 
-    def _is_valide_adress(self, addr: Uint16) -> bool:
-        is_overflowing = addr > Memory_DataSize or addr < 0
-        if is_overflowing:
-            print(f"[Memory Error]: {hex(addr)} is overflowing memory.")
-        return not is_overflowing
+    def _resolve_out_of_bounds(self, addr: Uint16) -> Uint16 | None:
+        self._out_of_bounds_count += 1
+        if self._bounds_policy == Memory_BoundsWrap:
+            return addr & Memory_AddressMask
+        if self._bounds_policy == Memory_BoundsTrap:
+            raise Exception(f"[MemoryError] {hex(addr)} is overflowing memory")
+        return None
 
     def _load_fontset(self) -> None:
         self.set_many(Memory_FontsetData, Memory_FontSetFirstAddress)
 
-    def set(self, value: Uint8, addr: Uint16) -> None:
-        if self._is_valide_adress(addr):
-            self._data[addr] = value
+    def _notify_write(self, addr: Uint16, length: int) -> None:
+        for listener in self._write_listeners:
+            listener(addr, length)
 
-    def get(self, addr: Uint16) -> Uint8:
-        if self._is_valide_adress(addr):
-            return self._data[addr]
+    def add_write_listener(self, listener: Callable[[Uint16, int], None]) -> None:
+        self._write_listeners.append(listener)
+
+    def remove_write_listener(self, listener: Callable[[Uint16, int], None]) -> None:
+        self._write_listeners.remove(listener)
+
+    def _update_read_hooks(self) -> None:
+        # Reads are hooked by shadowing get/get_many on the instance, so an unhooked memory pays nothing.
+        if self._read_listeners:
+            self.get = self._get_hooked
+            self.get_many = self._get_many_hooked
         else:
-            return 0
+            self.__dict__.pop("get", None)
+            self.__dict__.pop("get_many", None)
+
+    def add_read_listener(self, listener: Callable[[Uint16, int], None]) -> None:
+        self._read_listeners.append(listener)
+        self._update_read_hooks()
+
+    def remove_read_listener(self, listener: Callable[[Uint16, int], None]) -> None:
+        self._read_listeners.remove(listener)
+        self._update_read_hooks()
+
+    def _get_hooked(self, addr: Uint16) -> Uint8:
+        for listener in self._read_listeners:
+            listener(addr, 1)
+        return Memory.get(self, addr)
+
+    def _get_many_hooked(self, addr: Uint16, length: int) -> memoryview:
+        for listener in self._read_listeners:
+            listener(addr, length)
+        return Memory.get_many(self, addr, length)
 
-    def set_many(self, values: list[Uint8], addr: Uint16) -> None:
+    def set(self, value: Uint8, addr: Uint16) -> None:
+        if not 0 <= addr < Memory_DataSize:
+            addr = self._resolve_out_of_bounds(addr)
+            if addr is None:
+                return
+        self._data[addr] = value & 0xFF
+        self._notify_write(addr, 1)
+
+    def get(self, addr: Uint16) -> Uint8:
+        if not 0 <= addr < Memory_DataSize:
+            addr = self._resolve_out_of_bounds(addr)
+            if addr is None:
+                return 0
+        return self._data[addr]
+
+    def get_many(self, addr: Uint16, length: int) -> memoryview:
+        last_addr = addr + length
+        if 0 <= addr and last_addr <= Memory_DataSize:
+            return self._view[addr:last_addr]
+        return memoryview(bytes(Memory.get(self, byte_addr) for byte_addr in range(addr, last_addr)))
+
+    def fetch(self, addr: Uint16) -> Uint16:
+        if 0 <= addr < Memory_DataSize - 1:
+            return (self._data[addr] << 8) | self._data[addr + 1]
+        return (Memory.get(self, addr) << 8) | Memory.get(self, addr + 1)
+
+    def set_many(self, values: bytes | list[Uint8], addr: Uint16) -> None:
         last_addr = addr + len(values)
-        if self._is_valide_adress(addr) and self._is_valide_adress(last_addr):
+        if not (0 <= addr and last_addr <= Memory_DataSize):
+            for index, value in enumerate(values):
+                self.set(value, addr + index)
+            return
+        try:
             self._data[addr:last_addr] = values
+        except ValueError:
+            self._data[addr:last_addr] = bytes(value & 0xFF for value in values)
+        self._notify_write(addr, len(values))
+
+    def load_file(self, path: str, addr: Uint16) -> int:
+        with open(path, "rb") as f:
+            length = f.readinto(self._view[addr:])
+        self._notify_write(addr, length)
+        return length
+
+    def get_view(self) -> memoryview:
+        return self._view.toreadonly()
+
+    def get_out_of_bounds_count(self) -> int:
+        return self._out_of_bounds_count
+
+    def get_bounds_policy(self) -> str:
+        return self._bounds_policy
+
+def require_pygame() -> None:
+    if pygame is None:
+        raise Exception("[BackendError] pygame is required by the windowed backend")
 
 Display_Black = False
 Display_White = True
@@ -88,32 +214,47 @@ Display_BlackColor = "#000000"
 Display_WhiteColor = "#ffffff"
 Display_Icon = "assets/icon/C8-Logo-x48.png"
 Display_Caption = "Chip8 Emu"
+Display_RowMask = (1 << Display_PixelOnWidth) - 1
+Display_SpriteWidth = 8
+Display_RowFormat = "{:0" + str(Display_PixelOnWidth) + "b}"
 
-class Display:
-    _cells: list[list[bool]] = [[Display_Black] * Display_PixelOnHeight] * Display_PixelOnWidth 
+class DisplayBackend:
+    def present(self, rows: list[int]) -> None:
+        raise NotImplementedError()
+
+class HeadlessDisplayBackend(DisplayBackend):
+    def present(self, rows: list[int]) -> None:
+        pass
+
+class PygameDisplayBackend(DisplayBackend):
+    _palette: list[pygame.Color]
 
     screen: pygame.Surface
 
     def __init__(self):
+        require_pygame()
+        pygame.init()
+        self._palette = [pygame.Color(Display_BlackColor)] * 256
+        self._palette[ord("1")] = pygame.Color(Display_WhiteColor)
         icon = pygame.image.load(Display_Icon)
         pygame.display.set_icon(icon)
         pygame.display.set_caption(Display_Caption)
         self.screen = pygame.display.set_mode((Display_Width, Display_Height))
 
-    def _each_cells(self, callback: Callable[[bool, int, int], None]) -> None:
-        for x in range(Display_PixelOnWidth - 1):
-            for y in range(Display_PixelOnHeight - 1):
-                callback(self._cells[x][y], x, y)
-
-    def _fill_cell_if_white(self, x: int, y: int) -> None:
-        if self._cells[x][y] == Display_White:
-            rect = pygame.Rect(
-                x * Display_PixelDim,
-                y * Display_PixelDim,
-                Display_PixelDim,
-                Display_PixelDim
-            )
-            self.screen.fill(Display_WhiteColor, rect)
+    def present(self, rows: list[int]) -> None:
+        pixels = "".join(map(Display_RowFormat.format, rows)).encode("ascii")
+        frame = pygame.image.frombuffer(pixels, (Display_PixelOnWidth, Display_PixelOnHeight), "P")
+        frame.set_palette(self._palette)
+        pygame.transform.scale(frame.convert(self.screen), (Display_Width, Display_Height), self.screen)
+
+class Display:
+    _rows: list[int]
+    _dirty: bool = True
+    _backend: DisplayBackend
+
+    def __init__(self, backend: DisplayBackend | None = None):
+        self._rows = [0] * Display_PixelOnHeight
+        self._backend = backend if backend else HeadlessDisplayBackend()
 
     def _is_pixel_on_display(self, x: int, y: int) -> bool:
         _is_on_display = x >= 0 and x < Display_PixelOnWidth and y >= 0 and y < Display_PixelOnHeight
@@ -121,59 +262,141 @@ class Display:
             print(f"[Display Error]: x: {x}, y: {y} are not valid display coordinates.")
         return _is_on_display
 
-    def update(self) -> None:
-        self.screen.fill(Display_Black)
-        self._each_cells(lambda _, x, y: self._fill_cell_if_white(x, y))
+    def update(self) -> bool:
+        if not self._dirty:
+            return False
+        self._backend.present(self._rows)
+        self._dirty = False
+        return True
+
+    def invalidate(self) -> None:
+        self._dirty = True
 
     def clear(self) -> None:
-        def cb(_, x, y):
-            self._cells[x][y] = Display_Black
-        self._each_cells(cb)
+        self._rows[:] = [0] * Display_PixelOnHeight
+        self._dirty = True
+
+    def get_rows(self) -> list[int]:
+        return self._rows.copy()
+
+    def get_hash(self) -> str:
+        return hashlib.sha1(b"".join(row.to_bytes(8, "big") for row in self._rows)).hexdigest()
+
+    def set_rows(self, rows: list[int]) -> None:
+        self._rows[:] = rows
+        self._dirty = True
 
     def get_pixel(self, x: int, y: int) -> bool:
         if self._is_pixel_on_display(x, y):
-            return self._cells[x][y]
+            return bool((self._rows[y] >> (Display_PixelOnWidth - 1 - x)) & 1)
         return Display_Black
 
     def set_pixel(self, x: int, y: int, value: bool) -> None:
         if self._is_pixel_on_display(x, y):
-            self._cells[x][y] = value
+            bit = 1 << (Display_PixelOnWidth - 1 - x)
+            if value:
+                self._rows[y] |= bit
+            else:
+                self._rows[y] &= ~bit
+            self._dirty = True
+
+    def draw_sprite(self, x: int, y: int, sprite: list[Uint8]) -> bool:
+        shift = x % Display_PixelOnWidth
+        collision = False
+        for index, sprite_row in enumerate(sprite):
+            row_y = (y + index) % Display_PixelOnHeight
+            line = (sprite_row & 0xFF) << (Display_PixelOnWidth - Display_SpriteWidth)
+            line = ((line >> shift) | (line << (Display_PixelOnWidth - shift))) & Display_RowMask
+            row = self._rows[row_y]
+            if row & line:
+                collision = True
+            self._rows[row_y] = row ^ line
+        if sprite:
+            self._dirty = True
+        return collision
 
 Inputs_KeysPressedlength = 0x10
 Inputs_KeyPressedCorrespondence = [
-    pygame.K_KP0, pygame.K_KP1, pygame.K_KP2,
-    pygame.K_KP3, pygame.K_KP4, pygame.K_KP5,
-    pygame.K_KP6, pygame.K_KP7, pygame.K_KP8,
-    pygame.K_KP9, pygame.K_q, pygame.K_w,
-    pygame.K_e, pygame.K_r, pygame.K_t,
-    pygame.K_y,
+    "K_KP0", "K_KP1", "K_KP2",
+    "K_KP3", "K_KP4", "K_KP5",
+    "K_KP6", "K_KP7", "K_KP8",
+    "K_KP9", "K_q", "K_w",
+    "K_e", "K_r", "K_t",
+    "K_y",
 ]
 
-class Inputs:
-    _keys_pressed: list[bool] = [False] * Inputs_KeysPressedlength
-    _free_keys_pressed: list[int] = []
-    _free_keys_just_pressed: list[int] = []
-    _can_running = True
-
-    def _get_corresponding_key_index(self, event_type: pygame.event.EventType) -> int:
-        try:
-            return Inputs_KeyPressedCorrespondence.index(event_type)
-        except:
-            return -1
-
-    def _handle_keydown(self, event: pygame.event.Event) -> None:
+def load_keymap(path: str) -> list[str]:
+    with open(path, "r") as f:
+        mapping = json.load(f)
+    keymap = Inputs_KeyPressedCorrespondence.copy()
+    for key, name in mapping.items():
+        index = int(key, 16)
+        if index < 0 or index >= Inputs_KeysPressedlength:
+            raise Exception(f"[KeymapError] {key} is not a CHIP-8 key")
+        keymap[index] = name
+    return keymap
+
+class InputsBackend:
+    def poll(self, inputs: Inputs) -> None:
+        raise NotImplementedError()
+
+class HeadlessInputsBackend(InputsBackend):
+    def poll(self, inputs: Inputs) -> None:
+        pass
+
+class PygameInputsBackend(InputsBackend):
+    _keys_correspondence: dict[int, int]
+
+    def __init__(self, keymap: list[str] | None = None):
+        require_pygame()
+        self._keys_correspondence = {}
+        for index, name in enumerate(keymap or Inputs_KeyPressedCorrespondence):
+            if not hasattr(pygame, name):
+                raise Exception(f"[KeymapError] {name} is not a pygame key")
+            self._keys_correspondence[getattr(pygame, name)] = index
+
+    def _get_corresponding_key_index(self, key: int) -> int:
+        return self._keys_correspondence.get(key, -1)
+
+    def _handle_keydown(self, inputs: Inputs, event: pygame.event.Event) -> None:
         key = self._get_corresponding_key_index(event.key)
         if key != -1:
-            self._keys_pressed[key] = True
+            inputs.press_key(key)
         else:
-            self._set_free_key_pressed(event)
+            inputs.press_free_key(event.key)
 
-    def _handle_keyup(self, event: pygame.event.Event) -> None:
+    def _handle_keyup(self, inputs: Inputs, event: pygame.event.Event) -> None:
         key = self._get_corresponding_key_index(event.key)
         if key != -1:
-            self._keys_pressed[key] = False
+            inputs.release_key(key)
         else:
-            self._set_free_key_released(event)
+            inputs.release_free_key(event.key)
+
+    def poll(self, inputs: Inputs) -> None:
+        for event in pygame.event.get():
+            match event.type:
+                case pygame.QUIT:
+                    inputs.request_quit()
+                case pygame.KEYDOWN:
+                    self._handle_keydown(inputs, event)
+                case pygame.KEYUP:
+                    self._handle_keyup(inputs, event)
+
+class Inputs:
+    _keys_pressed: int
+    _free_keys_pressed: dict[int, None]
+    _free_keys_just_pressed: set[int]
+    _can_running: bool
+    _backend: InputsBackend
+    _key_listeners: list[Callable[[int, bool], None]]
+
+    def __init__(self, backend: InputsBackend | None = None):
+        self._keys_pressed = 0
+        self._free_keys_pressed = {}
+        self._free_keys_just_pressed = set()
+        self._key_listeners = []
+        self._can_running = True
+        self._backend = backend if backend else HeadlessInputsBackend()
 
     def _is_key_in_range(self, key: int) -> bool:
         _is_in_range = key >= 0 and key < Inputs_KeysPressedlength
@@ -181,41 +404,52 @@ class Inputs:
             print(f"[Inputs Error]: {hex(key)} is not in the keys range.")
         return _is_in_range
 
-    def _set_free_key_pressed(self, event: pygame.event.Event) -> None:
-        if event.key not in Inputs_KeyPressedCorrespondence:
-            if event.key not in self._free_keys_pressed:
-                self._free_keys_just_pressed.append(event.key)
-                self._free_keys_pressed.append(event.key)
+    def update(self) -> None:
+        self._free_keys_just_pressed.clear()
+        self._backend.poll(self)
 
-    def _set_free_key_released(self, event: pygame.event.Event) -> None:
-        if event.key not in Inputs_KeyPressedCorrespondence:
-            if event.key in self._free_keys_pressed:
-                self._free_keys_pressed.remove(event.key)
+    def _notify_key(self, key: int, pressed: bool) -> None:
+        for listener in self._key_listeners:
+            listener(key, pressed)
 
+    def add_key_listener(self, listener: Callable[[int, bool], None]) -> None:
+        self._key_listeners.append(listener)
 
-    def update(self) -> None:
-        self._free_keys_just_pressed.clear()
-        for event in pygame.event.get():
-            match event.type:
-                case pygame.QUIT:
-                    self._can_running = False
-                case pygame.KEYDOWN:
-                    self._handle_keydown(event)
-                case pygame.KEYUP:
-                    self._handle_keyup(event)
+    def press_key(self, key: int) -> None:
+        if self._is_key_in_range(key) and not self._keys_pressed >> key & 1:
+            self._keys_pressed |= 1 << key
+            self._notify_key(key, True)
+
+    def release_key(self, key: int) -> None:
+        if self._is_key_in_range(key) and self._keys_pressed >> key & 1:
+            self._keys_pressed &= ~(1 << key)
+            self._notify_key(key, False)
+
+    def press_free_key(self, key: int) -> None:
+        if key not in self._free_keys_pressed:
+            self._free_keys_just_pressed.add(key)
+            self._free_keys_pressed[key] = None
+
+    def release_free_key(self, key: int) -> None:
+        self._free_keys_pressed.pop(key, None)
+
+    def request_quit(self) -> None:
+        self._can_running = False
 
     def should_quit(self) -> bool:
         return not self._can_running
 
     def is_key_pressed(self, key: int) -> bool:
         if self._is_key_in_range(key):
-            return self._keys_pressed[key]
+            return bool(self._keys_pressed >> key & 1)
+
+    def is_any_key_pressed(self) -> bool:
+        return self._keys_pressed != 0
 
     def get_key_pressed(self) -> int | None:
-        for index, key in enumerate(self._keys_pressed):
-            if key:
-                return index
-        return None
+        if not self._keys_pressed:
+            return None
+        return (self._keys_pressed & -self._keys_pressed).bit_length() - 1
 
     def is_free_key_pressed(self, key: int) -> bool:
         return key in self._free_keys_pressed
@@ -225,12 +459,18 @@ class Inputs:
 
     def get_free_key_pressed(self) -> int | None:
         if self._free_keys_pressed:
-            return self._free_keys_pressed[-1]
+            return next(reversed(self._free_keys_pressed))
         else:
             return None
 
     def get_all_keys_pressed(self) -> list[bool]:
-        return self._keys_pressed.copy()
+        return [bool(self._keys_pressed >> key & 1) for key in range(Inputs_KeysPressedlength)]
+
+    def get_keys_mask(self) -> int:
+        return self._keys_pressed
+
+    def set_keys_mask(self, mask: int) -> None:
+        self._keys_pressed = mask & 0xFFFF
 
 
 @dataclass
@@ -239,6 +479,7 @@ class OpcodePayload:
     memory: Memory
     display: Display
     inputs: Inputs
+    rng: random.Random
 
 @dataclass
 class OpcodeAction:
@@ -255,18 +496,64 @@ class OpcodeTableEntry:
     id: Uint16
     callback: Callable[[OpcodePayload, OpcodeAction], None]
 
+@dataclass
+class OpcodeInstruction:
+    opcode: Uint16
+    callback: Callable[[OpcodePayload, OpcodeAction], None] | None
+    action: OpcodeAction
+    increments_pc: bool
+
+OpcodeTable_Size = 0x10000
+OpcodeTable_BuiltDispatches: dict[tuple, list[OpcodeTableEntry | None]] = {}
+
 class OpcodeTable:
-    _entries: list[OpcodeTableEntry] = []
+    _entries: list[OpcodeTableEntry]
+    _dispatch: list[OpcodeTableEntry | None]
+    _unsupported_opcodes: set[Uint16]
+
+    def __init__(self):
+        self._entries = []
+        self._unsupported_opcodes = set()
 
     def set(self, mask: Uint16, id: Uint16, callback: Callable[[OpcodePayload, OpcodeAction], None]) -> None:
         self._entries.append(OpcodeTableEntry(mask, id, callback))
 
+    def _create_dispatch(self) -> list[OpcodeTableEntry | None]:
+        # Filled from last to first so the first matching entry wins, like a linear scan.
+        dispatch = [None] * OpcodeTable_Size
+        for entry in reversed(self._entries):
+            free_bits = ~entry.mask & 0xFFFF
+            if entry.id & free_bits:
+                continue
+            variant = free_bits
+            while True:
+                dispatch[entry.id | variant] = entry
+                if variant == 0:
+                    break
+                variant = (variant - 1) & free_bits
+        return dispatch
+
+    def build(self) -> None:
+        # Tables built from the same entries are read-only and shared between CPUs.
+        key = tuple((entry.mask, entry.id, entry.callback) for entry in self._entries)
+        dispatch = OpcodeTable_BuiltDispatches.get(key)
+        if dispatch is None:
+            dispatch = self._create_dispatch()
+            OpcodeTable_BuiltDispatches[key] = dispatch
+        self._dispatch = dispatch
+
+    def get_dispatch(self) -> list[OpcodeTableEntry | None]:
+        return self._dispatch
+
     def get(self, opcode: Uint16) -> OpcodeTableEntry | None:
-        for entry in self._entries:
-            if (opcode & entry.mask) == entry.id:
-                return entry
-        print(f"[Opcode Error]: {hex(opcode)} opcode is not supported.")
-        return None
+        entry = self._dispatch[opcode]
+        if entry is None and opcode not in self._unsupported_opcodes:
+            self._unsupported_opcodes.add(opcode)
+            print(f"[Opcode Error]: {hex(opcode)} opcode is not supported.")
+        return entry
+
+    def get_unsupported_opcodes(self) -> list[Uint16]:
+        return sorted(self._unsupported_opcodes)
 
 def Opcode_0x0FFF(p: OpcodePayload, a: OpcodeAction) -> None:
     pass
@@ -354,22 +641,11 @@ def Opcode_0xB000(p: OpcodePayload, a: OpcodeAction) -> None:
     p.registers.pc = a.nnn + p.registers.v[0]
 
 def Opcode_0xC000(p: OpcodePayload, a: OpcodeAction) -> None:
-    p.registers.v[a.x] = random.randint(0, 255) & a.nn
+    p.registers.v[a.x] = p.rng.randint(0, 255) & a.nn
 
 def Opcode_0xD000(p: OpcodePayload, a: OpcodeAction) -> None:
-    pixel_collision = False
-    p.registers.v[0xF] = 0
-    for y in range(0, a.n):
-        sprite_raw = p.memory.get(p.registers.i + y)
-        for x in range(0, 8):
-            px = (sprite_raw >> (7 - x)) & 1
-            x_pos = (p.registers.v[a.x] + x) % Display_PixelOnWidth
-            y_pos = (p.registers.v[a.y] + y) % Display_PixelOnHeight
-            current_px = int(p.display.get_pixel(x_pos, y_pos))
-            new_px = current_px ^ px
-            if current_px == 1 and new_px == 0:
-                pixel_collision = True
-            p.display.set_pixel(x_pos, y_pos, bool(new_px))
+    sprite = p.memory.get_many(p.registers.i, a.n)
+    pixel_collision = p.display.draw_sprite(p.registers.v[a.x], p.registers.v[a.y], sprite)
     p.registers.v[0xF] = int(pixel_collision)
 
 def Opcode_0xE09E(p: OpcodePayload, a: OpcodeAction) -> None:
@@ -384,11 +660,10 @@ def Opcode_0xF007(p: OpcodePayload, a: OpcodeAction) -> None:
     p.registers.v[a.x] = p.registers.dt
 
 def Opcode_0xF00A(p: OpcodePayload, a: OpcodeAction) -> None:
-    pressed_key = p.inputs.get_key_pressed()
-    if pressed_key == None:
+    if not p.inputs.is_any_key_pressed():
         p.registers.pc -= 2
         return
-    p.registers.v[a.x] = pressed_key
+    p.registers.v[a.x] = p.inputs.get_key_pressed()
 
 def Opcode_0xF015(p: OpcodePayload, a: OpcodeAction) -> None:
     p.registers.dt = p.registers.v[a.x]
@@ -404,52 +679,801 @@ def Opcode_0xF029(p: OpcodePayload, a: OpcodeAction) -> None:
 
 def Opcode_0xF033(p: OpcodePayload, a: OpcodeAction) -> None:
     value = p.registers.v[a.x]
-    p.memory.set_many([
-        math.floor(value / 100),
-        math.floor((value % 100) / 10),
-        value % 10
-    ], p.registers.i)
+    p.memory.set_many([value // 100, value % 100 // 10, value % 10], p.registers.i)
 
 def Opcode_0xF055(p: OpcodePayload, a: OpcodeAction) -> None:
-    for i in range(0, a.x + 1):
-        p.memory.set(p.registers.v[i], p.registers.i + i)
+    p.memory.set_many(p.registers.v[:a.x + 1], p.registers.i)
 
 def Opcode_0xF065(p: OpcodePayload, a: OpcodeAction) -> None:
-    for i in range(0, a.x + 1):
-        p.registers.v[i] = p.memory.get(p.registers.i + i)
+    p.registers.v[:a.x + 1] = p.memory.get_many(p.registers.i, a.x + 1)
+
+def Opcode_0x8001_ResetVF(p: OpcodePayload, a: OpcodeAction) -> None:
+    p.registers.v[a.x] |= p.registers.v[a.y]
+    p.registers.v[0xF] = 0
+
+def Opcode_0x8002_ResetVF(p: OpcodePayload, a: OpcodeAction) -> None:
+    p.registers.v[a.x] &= p.registers.v[a.y]
+    p.registers.v[0xF] = 0
+
+def Opcode_0x8003_ResetVF(p: OpcodePayload, a: OpcodeAction) -> None:
+    p.registers.v[a.x] ^= p.registers.v[a.y]
+    p.registers.v[0xF] = 0
+
+def Opcode_0x8006_InPlace(p: OpcodePayload, a: OpcodeAction) -> None:
+    p.registers.v[0xF] = p.registers.v[a.x] & 1
+    p.registers.v[a.x] >>= 1
+
+def Opcode_0x800E_InPlace(p: OpcodePayload, a: OpcodeAction) -> None:
+    p.registers.v[0xF] = (p.registers.v[a.x] & 0x80) >> 7
+    p.registers.v[a.x] <<= 1
+
+def Opcode_0xB000_VX(p: OpcodePayload, a: OpcodeAction) -> None:
+    p.registers.pc = a.nnn + p.registers.v[a.x]
+
+def Opcode_0xF055_AddX(p: OpcodePayload, a: OpcodeAction) -> None:
+    p.memory.set_many(p.registers.v[:a.x + 1], p.registers.i)
+    p.registers.i += a.x
+
+def Opcode_0xF055_AddXPlusOne(p: OpcodePayload, a: OpcodeAction) -> None:
+    p.memory.set_many(p.registers.v[:a.x + 1], p.registers.i)
+    p.registers.i += a.x + 1
+
+def Opcode_0xF065_AddX(p: OpcodePayload, a: OpcodeAction) -> None:
+    p.registers.v[:a.x + 1] = p.memory.get_many(p.registers.i, a.x + 1)
+    p.registers.i += a.x
+
+def Opcode_0xF065_AddXPlusOne(p: OpcodePayload, a: OpcodeAction) -> None:
+    p.registers.v[:a.x + 1] = p.memory.get_many(p.registers.i, a.x + 1)
+    p.registers.i += a.x + 1
+
+Quirks_IndexKeep = "keep"
+Quirks_IndexAddX = "x"
+Quirks_IndexAddXPlusOne = "x+1"
+Quirks_LoadStoreCallbacks = {
+    Quirks_IndexKeep: (Opcode_0xF055, Opcode_0xF065),
+    Quirks_IndexAddX: (Opcode_0xF055_AddX, Opcode_0xF065_AddX),
+    Quirks_IndexAddXPlusOne: (Opcode_0xF055_AddXPlusOne, Opcode_0xF065_AddXPlusOne),
+}
+
+@dataclass(frozen=True)
+class QuirkProfile:
+    name: str
+    shift_in_place: bool
+    load_store_index: str
+    jump_with_vx: bool
+    logic_resets_vf: bool
+
+Quirks_DefaultProfile = "legacy"
+Quirks_Profiles = {
+    profile.name: profile for profile in [
+        QuirkProfile(Quirks_DefaultProfile, False, Quirks_IndexKeep, False, False),
+        QuirkProfile("cosmac-vip", False, Quirks_IndexAddXPlusOne, False, True),
+        QuirkProfile("chip-48", True, Quirks_IndexAddX, True, False),
+        QuirkProfile("super-chip", True, Quirks_IndexKeep, True, False),
+        QuirkProfile("modern", False, Quirks_IndexAddXPlusOne, False, False),
+    ]
+}
+
+def get_quirk_profile(name: str) -> QuirkProfile:
+    if name not in Quirks_Profiles:
+        raise Exception(f"[QuirksError] unknown quirk profile '{name}', expected one of {', '.join(Quirks_Profiles)}")
+    return Quirks_Profiles[name]
+
+def load_quirks_database(path: str) -> dict[str, str]:
+    with open(path, "r") as f:
+        database = json.load(f)
+    for rom_hash, name in database.items():
+        get_quirk_profile(name)
+    return {rom_hash.lower(): name for rom_hash, name in database.items()}
+
+Recompiler_BlockMaxLength = 64
+Recompiler_InlineTemplates: dict[Callable[[OpcodePayload, OpcodeAction], None], list[str]] = {
+    Opcode_0x6000: ["v[{x}] = {nn}"],
+    Opcode_0x7000: ["v[{x}] = (v[{x}] + {nn}) & 0xFF"],
+    Opcode_0x8000: ["v[{x}] = v[{y}]"],
+    Opcode_0x8001: ["v[{x}] |= v[{y}]"],
+    Opcode_0x8002: ["v[{x}] &= v[{y}]"],
+    Opcode_0x8003: ["v[{x}] ^= v[{y}]"],
+    Opcode_0x8004: [
+        "result = v[{x}] + v[{y}]",
+        "v[0xF] = 1 if result > 255 else 0",
+        "v[{x}] = result & 0xFF",
+    ],
+    Opcode_0x8005: [
+        "v[0xF] = 1 if v[{x}] > v[{y}] else 0",
+        "v[{x}] -= v[{y}]",
+    ],
+    Opcode_0x8006: [
+        "v[{x}] = v[{y}]",
+        "v[0xF] = v[{x}] & 1",
+        "v[{x}] >>= 1",
+    ],
+    Opcode_0x8007: [
+        "v[0xF] = 1 if v[{y}] > v[{x}] else 0",
+        "v[{x}] = v[{y}] - v[{x}]",
+    ],
+    Opcode_0x800E: [
+        "v[{x}] = v[{y}]",
+        "v[0xF] = (v[{x}] & 0x80) >> 7",
+        "v[{x}] <<= 1",
+    ],
+    Opcode_0x8001_ResetVF: ["v[{x}] |= v[{y}]", "v[0xF] = 0"],
+    Opcode_0x8002_ResetVF: ["v[{x}] &= v[{y}]", "v[0xF] = 0"],
+    Opcode_0x8003_ResetVF: ["v[{x}] ^= v[{y}]", "v[0xF] = 0"],
+    Opcode_0x8006_InPlace: ["v[0xF] = v[{x}] & 1", "v[{x}] >>= 1"],
+    Opcode_0x800E_InPlace: ["v[0xF] = (v[{x}] & 0x80) >> 7", "v[{x}] <<= 1"],
+    Opcode_0xA000: ["r.i = {nnn}"],
+    Opcode_0xF007: ["v[{x}] = r.dt"],
+    Opcode_0xF015: ["r.dt = v[{x}]"],
+    Opcode_0xF018: ["r.st = v[{x}]"],
+    Opcode_0xF01E: ["r.i += v[{x}]"],
+    Opcode_0xF029: ["r.i = (v[{x}] & 0x0F) * 5"],
+}
+Recompiler_SkipConditions: dict[Callable[[OpcodePayload, OpcodeAction], None], str] = {
+    Opcode_0x3000: "v[{x}] == {nn}",
+    Opcode_0x4000: "v[{x}] != {nn}",
+    Opcode_0x5000: "v[{x}] == v[{y}]",
+    Opcode_0x9000: "v[{x}] != v[{y}]",
+}
+Recompiler_BlockEndingCallbacks = [
+    Opcode_0x00EE, Opcode_0x1000, Opcode_0x2000, Opcode_0x3000,
+    Opcode_0x4000, Opcode_0x5000, Opcode_0x9000, Opcode_0xB000,
+    Opcode_0xD000, Opcode_0xE09E, Opcode_0xE0A1, Opcode_0xF00A,
+    Opcode_0xF033, Opcode_0xF055, Opcode_0xB000_VX, Opcode_0xF055_AddX,
+    Opcode_0xF055_AddXPlusOne,
+]
+
+@dataclass
+class RecompilerBlock:
+    start: Uint16
+    addresses: list[Uint16]
+    opcodes: list[int]
+    run: Callable[[OpcodePayload], None]
+
+@dataclass
+class RecompilerSource:
+    start: Uint16
+    end: Uint16
+    addresses: list[Uint16]
+    opcodes: list[int]
+    lines: list[str]
+    namespace: dict[str, object]
+    exit: OpcodeInstruction | None
+
+class Recompiler:
+    _decode: Callable[[Uint16], OpcodeInstruction]
+    _blocks: dict[Uint16, RecompilerBlock]
+    _owners: dict[Uint16, set[Uint16]]
+    _jit: bool
+
+    def __init__(self, decode: Callable[[Uint16], OpcodeInstruction], jit: bool = True):
+        self._decode = decode
+        self._blocks = {}
+        self._owners = {}
+        self._jit = jit
+
+    def _format(self, template: str, a: OpcodeAction) -> str:
+        return "    " + template.format(x=a.x, y=a.y, n=a.n, nn=a.nn, nnn=a.nnn)
+
+    def _generate(self, start: Uint16) -> RecompilerSource:
+        lines = [f"def block_{start}(p):", "    r = p.registers", "    v = r.v"]
+        namespace = {}
+        addresses: list[Uint16] = []
+        opcodes: list[int] = []
+        addr = start
+        ended = False
+        instruction = None
+
+        while not ended and len(opcodes) < Recompiler_BlockMaxLength and addr < Memory_DataSize - 1:
+            instruction = self._decode(addr)
+            callback = instruction.callback
+            if callback is None:
+                break
+            a = instruction.action
+            ended = callback in Recompiler_BlockEndingCallbacks
+            addresses.append(addr)
+            opcodes.append(instruction.opcode)
+
+            if callback is Opcode_0x2000:
+                lines += ["    r.sp += 1", f"    r.stack[r.sp] = {addr}"]
+            if callback is Opcode_0x1000 or callback is Opcode_0x2000:
+                # Jumps and calls are followed so the target joins the block, unless it is a loop the CPU must see end.
+                if a.nnn not in addresses and a.nnn != addr - 4:
+                    ended = False
+                    addr = a.nnn
+                    continue
+                lines.append(f"    r.pc = {a.nnn}")
+            elif callback in Recompiler_InlineTemplates:
+                lines += [self._format(line, a) for line in Recompiler_InlineTemplates[callback]]
+            elif callback in Recompiler_SkipConditions:
+                condition = self._format(Recompiler_SkipConditions[callback], a).strip()
+                lines.append(f"    r.pc = {addr + 4} if {condition} else {addr + 2}")
+            elif callback is Opcode_0xF00A:
+                lines += [
+                    "    if p.inputs.is_any_key_pressed():",
+                    f"        v[{a.x}] = p.inputs.get_key_pressed()",
+                    f"        r.pc = {addr + 2}",
+                    "    else:",
+                    f"        r.pc = {addr}",
+                ]
+            else:
+                namespace[callback.__name__] = callback
+                namespace[f"a_{addr}"] = a
+                if ended:
+                    lines.append(f"    r.pc = {addr}")
+                lines.append(f"    {callback.__name__}(p, a_{addr})")
+                if ended and instruction.increments_pc:
+                    lines.append("    r.pc += 2")
+            addr += 2
+
+        if not ended:
+            lines.append(f"    r.pc = {addr}")
+        return RecompilerSource(start, addr, addresses, opcodes, lines, namespace, instruction if ended else None)
+
+    def _get_successors(self, source: RecompilerSource) -> list[Uint16]:
+        returns = [addr + 2 for addr in source.addresses if self._decode(addr).callback is Opcode_0x2000]
+        if source.exit is None:
+            return returns + ([source.end] if len(source.opcodes) == Recompiler_BlockMaxLength else [])
+        callback = source.exit.callback
+        addr = source.addresses[-1]
+        if callback is Opcode_0x1000 or callback is Opcode_0x2000:
+            return returns + [source.exit.action.nnn]
+        if callback in (Opcode_0x00EE, Opcode_0xB000, Opcode_0xB000_VX):
+            return returns
+        if callback in Recompiler_SkipConditions or callback is Opcode_0xE09E or callback is Opcode_0xE0A1:
+            return returns + [addr + 2, addr + 4]
+        if callback is Opcode_0xF00A:
+            return returns + [addr, addr + 2]
+        return returns + [addr + 2]
+
+    def _add_block(self, block: RecompilerBlock) -> RecompilerBlock:
+        self._blocks[block.start] = block
+        for addr in block.addresses:
+            self._owners.setdefault(addr, set()).add(block.start)
+            self._owners.setdefault(addr + 1, set()).add(block.start)
+        return block
+
+    def _compile(self, start: Uint16) -> RecompilerBlock | None:
+        source = self._generate(start)
+        if not source.opcodes:
+            return None
+        namespace = source.namespace
+        exec(compile("\n".join(source.lines), f"<chip8 block {hex(start)}>", "exec"), namespace)
+        return self._add_block(RecompilerBlock(start, source.addresses, source.opcodes, namespace[f"block_{start}"]))
+
+    def translate(self, entry: Uint16) -> str:
+        lines = ["# Generated by the CHIP-8 ahead-of-time translator, do not edit.", ""]
+        blocks: list[RecompilerSource] = []
+        actions: dict[str, OpcodeAction] = {}
+        pending = [entry]
+        visited = set()
+        while pending:
+            start = pending.pop()
+            if start in visited or start < 0 or start >= Memory_DataSize - 1:
+                continue
+            visited.add(start)
+            source = self._generate(start)
+            if not source.opcodes:
+                continue
+            blocks.append(source)
+            actions.update((name, value) for name, value in source.namespace.items() if name.startswith("a_"))
+            pending += self._get_successors(source)
+        lines += [f"{name} = {action!r}" for name, action in sorted(actions.items())]
+        for source in sorted(blocks, key=lambda source: source.start):
+            lines += ["", ""] + source.lines
+        lines += ["", "", "BLOCKS = ["]
+        lines += [f"    ({source.start}, {source.addresses}, {source.opcodes}, block_{source.start})," for source in sorted(blocks, key=lambda source: source.start)]
+        lines += ["]", ""]
+        return "\n".join(lines)
+
+    def install(self, blocks: list[tuple[Uint16, list[Uint16], list[int], Callable[[OpcodePayload], None]]]) -> int:
+        installed = 0
+        for start, addresses, opcodes, run in blocks:
+            if start in self._blocks:
+                continue
+            if any(self._decode(addr).opcode != opcode for addr, opcode in zip(addresses, opcodes)):
+                continue
+            self._add_block(RecompilerBlock(start, addresses, opcodes, run))
+            installed += 1
+        return installed
+
+    def get_blocks(self) -> dict[Uint16, RecompilerBlock]:
+        return self._blocks
+
+    def get(self, addr: Uint16) -> RecompilerBlock | None:
+        block = self._blocks.get(addr)
+        if block is None and self._jit:
+            block = self._compile(addr)
+        return block
+
+    def invalidate(self, addr: Uint16, length: int) -> None:
+        if length >= Memory_DataSize:
+            self._blocks.clear()
+            self._owners.clear()
+            return
+        for byte_addr in range(addr, addr + length):
+            for start in self._owners.pop(byte_addr, set()):
+                block = self._blocks.pop(start, None)
+                if block is None:
+                    continue
+                for owned_addr in block.addresses:
+                    for owned_byte_addr in (owned_addr, owned_addr + 1):
+                        owners = self._owners.get(owned_byte_addr)
+                        if owners is not None:
+                            owners.discard(start)
+                            if not owners:
+                                del self._owners[owned_byte_addr]
+
+Profiler_TopLength = 5
+Profiler_UnsupportedFamily = "unsupported"
+
+@dataclass
+class ProfilerEntry:
+    key: str
+    count: int
+    time: float
+
+class Profiler:
+    _family_counts: dict[str, int]
+    _family_times: dict[str, float]
+    _address_counts: dict[Uint16, int]
+    _address_times: dict[Uint16, float]
+
+    def __init__(self):
+        self.reset()
+
+    def _get_family(self, callback: Callable[[OpcodePayload, OpcodeAction], None] | None) -> str:
+        if callback is None:
+            return Profiler_UnsupportedFamily
+        return callback.__name__.removeprefix("Opcode_")
+
+    def _get_top(self, counts: dict, times: dict, length: int) -> list[ProfilerEntry]:
+        keys = sorted(times, key=times.get, reverse=True)[:length]
+        return [ProfilerEntry(key, counts[key], times[key]) for key in keys]
+
+    def reset(self) -> None:
+        self._family_counts = {}
+        self._family_times = {}
+        self._address_counts = {}
+        self._address_times = {}
+
+    def record(self, addr: Uint16, callback: Callable[[OpcodePayload, OpcodeAction], None] | None, elapsed: float) -> None:
+        family = self._get_family(callback)
+        self._family_counts[family] = self._family_counts.get(family, 0) + 1
+        self._family_times[family] = self._family_times.get(family, 0.0) + elapsed
+        self._address_counts[addr] = self._address_counts.get(addr, 0) + 1
+        self._address_times[addr] = self._address_times.get(addr, 0.0) + elapsed
+
+    def get_total_time(self) -> float:
+        return sum(self._family_times.values())
+
+    def get_top_families(self, length: int = Profiler_TopLength) -> list[ProfilerEntry]:
+        return self._get_top(self._family_counts, self._family_times, length)
+
+    def get_top_addresses(self, length: int = Profiler_TopLength) -> list[ProfilerEntry]:
+        entries = self._get_top(self._address_counts, self._address_times, length)
+        return [ProfilerEntry(hex(entry.key), entry.count, entry.time) for entry in entries]
+
+    def get_report(self) -> dict[str, list[dict]]:
+        return {
+            "families": [vars(entry) for entry in self.get_top_families(len(self._family_times))],
+            "addresses": [vars(entry) for entry in self.get_top_addresses(len(self._address_times))],
+        }
+
+    def dump(self, path: str) -> None:
+        report = self.get_report()
+        with open(path, "w", newline="") as f:
+            if not path.endswith(".csv"):
+                json.dump(report, f, indent=2)
+                return
+            writer = csv.writer(f)
+            writer.writerow(["kind", "key", "count", "time"])
+            for kind, entries in report.items():
+                for entry in entries:
+                    writer.writerow([kind, entry["key"], entry["count"], entry["time"]])
+
+class Coverage:
+    _executed: array
+    _read: array
+    _written: array
 
-CPU_CycleDuration = 1 / 60
-CPU_OpcodeHistoryMaxLength = 10
+    def __init__(self):
+        self.reset()
+
+    def _record(self, counts: array, addr: Uint16, length: int) -> None:
+        for byte_addr in range(max(addr, 0), min(addr + length, Memory_DataSize)):
+            counts[byte_addr] += 1
+
+    def reset(self) -> None:
+        self._executed = array("Q", bytes(8 * Memory_DataSize))
+        self._read = array("Q", bytes(8 * Memory_DataSize))
+        self._written = array("Q", bytes(8 * Memory_DataSize))
+
+    def record_execution(self, addr: Uint16) -> None:
+        self._record(self._executed, addr, 2)
+
+    def record_read(self, addr: Uint16, length: int) -> None:
+        self._record(self._read, addr, length)
+
+    def record_write(self, addr: Uint16, length: int) -> None:
+        if length < Memory_DataSize:
+            self._record(self._written, addr, length)
+
+    def get_executed(self) -> array:
+        return self._executed
+
+    def get_read(self) -> array:
+        return self._read
+
+    def get_written(self) -> array:
+        return self._written
+
+    def get_report(self) -> dict[str, list[dict]]:
+        addresses = []
+        for addr, counts in enumerate(zip(self._executed, self._read, self._written)):
+            if any(counts):
+                executed, read, written = counts
+                addresses.append({"address": hex(addr), "executed": executed, "read": read, "written": written})
+        return {"addresses": addresses}
+
+    def dump(self, path: str) -> None:
+        report = self.get_report()
+        with open(path, "w", newline="") as f:
+            if not path.endswith(".csv"):
+                json.dump(report, f, indent=2)
+                return
+            writer = csv.writer(f)
+            writer.writerow(["address", "executed", "read", "written"])
+            for entry in report["addresses"]:
+                writer.writerow([entry["address"], entry["executed"], entry["read"], entry["written"]])
+
+OpcodeHistory_DefaultDepth = 4096
+
+@dataclass
+class OpcodeHistoryEntry:
+    pc: Uint16
+    opcode: Uint16
+    changed_registers: dict[int, Uint8]
+
+class OpcodeHistory:
+    _depth: int
+    _entries: list[tuple[Uint16 | list[Uint16], Uint16 | list[Uint16], tuple[Uint8, ...]] | None]
+    _index: int
+
+    def __init__(self, depth: int = OpcodeHistory_DefaultDepth):
+        self._depth = max(1, depth)
+        self._entries = [None] * self._depth
+        self._index = 0
+
+    def record(self, pc: Uint16, opcode: Uint16, v: list[Uint8]) -> None:
+        self._entries[self._index] = (pc, opcode, tuple(v))
+        self._index = (self._index + 1) % self._depth
+
+    def record_block(self, addresses: list[Uint16], opcodes: list[Uint16], v: list[Uint8]) -> None:
+        self._entries[self._index] = (addresses, opcodes, tuple(v))
+        self._index = (self._index + 1) % self._depth
+
+    def _get_raw_entries(self, length: int) -> list[tuple[Uint16, Uint16, tuple[Uint8, ...] | None]]:
+        raw_entries = []
+        for entry in self._entries[self._index:] + self._entries[:self._index]:
+            if entry is None:
+                continue
+            pc, opcodes, registers = entry
+            if not isinstance(opcodes, list):
+                raw_entries.append(entry)
+                continue
+            last = len(opcodes) - 1
+            for index, (addr, opcode) in enumerate(zip(pc, opcodes)):
+                raw_entries.append((addr, opcode, registers if index == last else None))
+        return raw_entries[-length:]
+
+    def get_depth(self) -> int:
+        return self._depth
+
+    def get_opcodes(self, length: int) -> list[Uint16]:
+        return [opcode for _, opcode, _ in self._get_raw_entries(length)]
+
+    def get_entries(self, length: int | None = None) -> list[OpcodeHistoryEntry]:
+        raw_entries = self._get_raw_entries(length or self._depth)
+        entries = []
+        previous = None
+        for pc, opcode, registers in raw_entries:
+            changed = {}
+            if registers is not None:
+                if previous is not None:
+                    changed = {index: value for index, (old, value) in enumerate(zip(previous, registers)) if old != value}
+                previous = registers
+            entries.append(OpcodeHistoryEntry(pc, opcode, changed))
+        return entries
+
+Trace_Magic = b"C8TR"
+Trace_Version = 1
+Trace_Record = struct.Struct(">HH")
+Trace_ChunkLength = 4096
+
+class TraceWriter:
+    _file: object
+    _buffer: bytearray
+    _offset: int
+
+    def __init__(self, path: str):
+        self._file = open(path, "wb")
+        self._file.write(Trace_Magic + bytes([Trace_Version]))
+        self._buffer = bytearray(Trace_Record.size * Trace_ChunkLength)
+        self._offset = 0
+
+    def write(self, pc: Uint16, opcode: Uint16) -> None:
+        Trace_Record.pack_into(self._buffer, self._offset, pc & 0xFFFF, opcode)
+        self._offset += Trace_Record.size
+        if self._offset == len(self._buffer):
+            self.flush()
+
+    def flush(self) -> None:
+        self._file.write(memoryview(self._buffer)[:self._offset])
+        self._offset = 0
+
+    def close(self) -> None:
+        self.flush()
+        self._file.close()
+
+def read_trace(path: str) -> list[tuple[Uint16, Uint16]]:
+    with open(path, "rb") as f:
+        data = f.read()
+    header = Trace_Magic + bytes([Trace_Version])
+    if not data.startswith(header):
+        raise Exception(f"[TraceError] {path} is not a version {Trace_Version} trace")
+    body = data[len(header):]
+    return list(Trace_Record.iter_unpack(body[:len(body) - len(body) % Trace_Record.size]))
+
+Breakpoints_ConditionPattern = re.compile(
+    r"^\s*(?:(0x[0-9a-f]+|\d+)\s*:)?\s*(v[0-9a-f]|i|sp|dt|st)\s*(==|!=|<=|>=|<|>)\s*(0x[0-9a-f]+|\d+)\s*$", re.IGNORECASE
+)
+Breakpoints_WatchpointPattern = re.compile(
+    r"^\s*(0x[0-9a-f]+|\d+)\s*(?:-\s*(0x[0-9a-f]+|\d+))?\s*(?::\s*([rw]+))?\s*$", re.IGNORECASE
+)
+Breakpoints_Operators = {
+    "==": operator.eq, "!=": operator.ne, "<=": operator.le,
+    ">=": operator.ge, "<": operator.lt, ">": operator.gt,
+}
+
+@dataclass
+class BreakpointCondition:
+    pc: Uint16 | None
+    register: str
+    operator: str
+    value: int
+
+    def __str__(self) -> str:
+        location = f"{hex(self.pc)}: " if self.pc is not None else ""
+        return f"{location}{self.register} {self.operator} {hex(self.value)}"
+
+@dataclass
+class Watchpoint:
+    start: Uint16
+    end: Uint16
+    read: bool
+    write: bool
+
+    def __str__(self) -> str:
+        return f"{hex(self.start)}-{hex(self.end - 1)}:{'r' if self.read else ''}{'w' if self.write else ''}"
+
+class Breakpoints:
+    _memory: Memory
+    _addresses: set[Uint16]
+    _conditions: list[BreakpointCondition]
+    _condition_results: list[bool]
+    _watchpoints: list[Watchpoint]
+    _temporary: Uint16 | None
+    _hit: str | None
+
+    def __init__(self, memory: Memory):
+        self._memory = memory
+        self._addresses = set()
+        self._conditions = []
+        self._condition_results = []
+        self._watchpoints = []
+        self._temporary = None
+        self._hit = None
+
+    def _find_watchpoint(self, addr: Uint16, length: int, read: bool) -> Watchpoint | None:
+        for watchpoint in self._watchpoints:
+            if (watchpoint.read if read else watchpoint.write) and addr < watchpoint.end and watchpoint.start < addr + length:
+                return watchpoint
+        return None
+
+    def _on_read(self, addr: Uint16, length: int) -> None:
+        watchpoint = self._find_watchpoint(addr, length, True)
+        if watchpoint and self._hit is None:
+            self._hit = f"read of {hex(addr)} ({watchpoint})"
+
+    def _on_write(self, addr: Uint16, length: int) -> None:
+        if length >= Memory_DataSize:
+            return
+        watchpoint = self._find_watchpoint(addr, length, False)
+        if watchpoint and self._hit is None:
+            self._hit = f"write of {hex(addr)} ({watchpoint})"
+
+    def _get_register(self, registers: Registers, name: str) -> int:
+        if name.startswith("v"):
+            return registers.v[int(name[1:], 16)]
+        return getattr(registers, name)
+
+    def is_empty(self) -> bool:
+        return not (self._addresses or self._conditions or self._watchpoints) and self._temporary is None
+
+    def add_address(self, addr: Uint16) -> None:
+        self._addresses.add(addr)
+
+    def remove_address(self, addr: Uint16) -> None:
+        self._addresses.discard(addr)
+
+    def toggle_address(self, addr: Uint16) -> bool:
+        if addr in self._addresses:
+            self._addresses.remove(addr)
+            return False
+        self._addresses.add(addr)
+        return True
+
+    def add_condition(self, text: str) -> BreakpointCondition:
+        match = Breakpoints_ConditionPattern.match(text)
+        if match is None:
+            raise Exception(f"[BreakpointError] '{text}' is not a condition like 'v3 == 5' or '0x2a0: i >= 0x300'")
+        pc, register, operator_text, value = match.groups()
+        condition = BreakpointCondition(int(pc, 0) if pc else None, register.lower(), operator_text, int(value, 0))
+        self._conditions.append(condition)
+        self._condition_results.append(False)
+        return condition
+
+    def add_watchpoint(self, text: str) -> Watchpoint:
+        match = Breakpoints_WatchpointPattern.match(text)
+        if match is None:
+            raise Exception(f"[BreakpointError] '{text}' is not a watchpoint like '0x300-0x30f:rw'")
+        start, last, access = match.groups()
+        access = (access or "rw").lower()
+        watchpoint = Watchpoint(int(start, 0), int(last or start, 0) + 1, "r" in access, "w" in access)
+        if not self._watchpoints:
+            self._memory.add_read_listener(self._on_read)
+            self._memory.add_write_listener(self._on_write)
+        self._watchpoints.append(watchpoint)
+        return watchpoint
+
+    def clear(self) -> None:
+        if self._watchpoints:
+            self._memory.remove_read_listener(self._on_read)
+            self._memory.remove_write_listener(self._on_write)
+        self._addresses.clear()
+        self._conditions.clear()
+        self._condition_results.clear()
+        self._watchpoints.clear()
+        self._temporary = None
+        self._hit = None
+
+    def set_temporary(self, addr: Uint16 | None) -> None:
+        self._temporary = addr
+
+    def has_address_in(self, addresses: list[Uint16]) -> bool:
+        if self._temporary in addresses:
+            return True
+        if any(condition.pc in addresses for condition in self._conditions if condition.pc is not None):
+            return True
+        return not self._addresses.isdisjoint(addresses)
+
+    def check(self, registers: Registers) -> str | None:
+        pc = registers.pc
+        if pc == self._temporary:
+            self._temporary = None
+            return "step over"
+        if pc in self._addresses:
+            return "breakpoint"
+        reason = None
+        for index, condition in enumerate(self._conditions):
+            if condition.pc is not None and condition.pc != pc:
+                continue
+            result = Breakpoints_Operators[condition.operator](self._get_register(registers, condition.register), condition.value)
+            if condition.pc is None:
+                # Conditions without an address only fire when they become true, so continuing moves past them.
+                result, self._condition_results[index] = result and not self._condition_results[index], result
+            if result and reason is None:
+                reason = f"condition {condition}"
+        return reason
+
+    def pop_hit(self) -> str | None:
+        hit = self._hit
+        self._hit = None
+        return hit
+
+    def describe(self) -> list[str]:
+        return (
+            [hex(addr) for addr in sorted(self._addresses)]
+            + [str(condition) for condition in self._conditions]
+            + [str(watchpoint) for watchpoint in self._watchpoints]
+        )
+
+CPU_TimerFrequency = 60
+CPU_FrameDuration = 1 / CPU_TimerFrequency
+CPU_DefaultClockSpeed = 700
+CPU_MaxCatchUpFrames = 30
+CPU_TurboPresentRate = 30
 CPU_OmitIncrementProgramCounterOpcodes = [
     0x00EE, 0x1000, 0x2000, 0xB000
 ]
 
 class CPU:
-    _opcode_table = OpcodeTable()
-    registers = Registers()
+    _opcode_table: OpcodeTable
+    registers: Registers
 
     _memory: Memory
     _display: Display
     _inputs: Inputs
 
-    _last_timer_update: float
-    _last_cycle_time: float
+    _clock_speed: float
+    _instructions_per_frame: float
+    _instruction_budget: float = 0.0
+    _next_frame_time: float
 
     _frequency: int = 0
     _cycles_executed: int = 0
     _last_frequency_time: float = 0.0
 
-    _opcodes_history: list[int] = []
+    _turbo: bool = False
+    _idle: bool = False
+    _speed: float = 0.0
+    _frames_executed: int = 0
+    _total_executed: int = 0
+
+    _history: OpcodeHistory
+
+    _payload: OpcodePayload
+    _instructions: dict[Uint16, OpcodeInstruction]
+    _quirks: QuirkProfile
+    _recompiler: Recompiler | None = None
+    _blocks: dict[Uint16, RecompilerBlock] | None = None
+    _block_addresses: list[Uint16]
+    _profiler: Profiler | None = None
+    _trace: TraceWriter | None = None
+    _coverage: Coverage | None = None
+    _breakpoints: Breakpoints
+    _paused: bool = False
+    _pause_reason: str = ""
+    _resume_pc: Uint16 | None = None
+    _timer_listeners: list[Callable[[int], None]]
 
-    def __init__(self, memory: Memory, display: Display, inputs: Inputs):
+    def __init__(
+        self,
+        memory: Memory,
+        display: Display,
+        inputs: Inputs,
+        recompiler: bool = False,
+        clock_speed: float = CPU_DefaultClockSpeed,
+        history_depth: int = OpcodeHistory_DefaultDepth,
+        seed: int | None = None,
+        aot: bool = False,
+        quirks: str = Quirks_DefaultProfile
+    ):
         self._memory = memory
         self._display = display
         self._inputs = inputs
+        self._opcode_table = OpcodeTable()
+        self._quirks = get_quirk_profile(quirks)
+        self.registers = Registers()
+        self._history = OpcodeHistory(history_depth)
+        self._breakpoints = Breakpoints(memory)
+        self._timer_listeners = []
+        self._payload = OpcodePayload(self.registers, memory, display, inputs, random.Random(seed))
+        self._instructions = {}
+        self._block_addresses = []
+        self._memory.add_write_listener(self._invalidate_instructions)
+        if recompiler or aot:
+            self._recompiler = Recompiler(self._get_instruction, recompiler)
+            self._memory.add_write_listener(self._recompiler.invalidate)
+            self._blocks = self._recompiler.get_blocks()
         self._init_opcode_table()
-        self._last_timer_update = time.perf_counter()
-        self._last_cycle_time = time.perf_counter()
+        self.set_clock_speed(clock_speed)
+        self._next_frame_time = time.perf_counter() + CPU_FrameDuration
 
     def _init_opcode_table(self) -> None:
+        quirks = self._quirks
+        store_callback, load_callback = Quirks_LoadStoreCallbacks[quirks.load_store_index]
         self._opcode_table.set(0xF000, 0x0FFF, Opcode_0x0FFF)
         self._opcode_table.set(0xFFFF, 0x00E0, Opcode_0x00E0)
         self._opcode_table.set(0xFFFF, 0x00EE, Opcode_0x00EE)
@@ -461,17 +1485,17 @@ class CPU:
         self._opcode_table.set(0xF000, 0x6000, Opcode_0x6000)
         self._opcode_table.set(0xF000, 0x7000, Opcode_0x7000)
         self._opcode_table.set(0xF00F, 0x8000, Opcode_0x8000)
-        self._opcode_table.set(0xF00F, 0x8001, Opcode_0x8001)
-        self._opcode_table.set(0xF00F, 0x8002, Opcode_0x8002)
-        self._opcode_table.set(0xF00F, 0x8003, Opcode_0x8003)
+        self._opcode_table.set(0xF00F, 0x8001, Opcode_0x8001_ResetVF if quirks.logic_resets_vf else Opcode_0x8001)
+        self._opcode_table.set(0xF00F, 0x8002, Opcode_0x8002_ResetVF if quirks.logic_resets_vf else Opcode_0x8002)
+        self._opcode_table.set(0xF00F, 0x8003, Opcode_0x8003_ResetVF if quirks.logic_resets_vf else Opcode_0x8003)
         self._opcode_table.set(0xF00F, 0x8004, Opcode_0x8004)
         self._opcode_table.set(0xF00F, 0x8005, Opcode_0x8005)
-        self._opcode_table.set(0xF00F, 0x8006, Opcode_0x8006)
+        self._opcode_table.set(0xF00F, 0x8006, Opcode_0x8006_InPlace if quirks.shift_in_place else Opcode_0x8006)
         self._opcode_table.set(0xF00F, 0x8007, Opcode_0x8007)
-        self._opcode_table.set(0xF00F, 0x800E, Opcode_0x800E)
+        self._opcode_table.set(0xF00F, 0x800E, Opcode_0x800E_InPlace if quirks.shift_in_place else Opcode_0x800E)
         self._opcode_table.set(0xF000, 0x9000, Opcode_0x9000)
         self._opcode_table.set(0xF000, 0xA000, Opcode_0xA000)
-        self._opcode_table.set(0xF000, 0xB000, Opcode_0xB000)
+        self._opcode_table.set(0xF000, 0xB000, Opcode_0xB000_VX if quirks.jump_with_vx else Opcode_0xB000)
         self._opcode_table.set(0xF000, 0xC000, Opcode_0xC000)
         self._opcode_table.set(0xF000, 0xD000, Opcode_0xD000)
         self._opcode_table.set(0xF0FF, 0xE09E, Opcode_0xE09E)
@@ -483,11 +1507,12 @@ class CPU:
         self._opcode_table.set(0xF0FF, 0xF01E, Opcode_0xF01E)
         self._opcode_table.set(0xF0FF, 0xF029, Opcode_0xF029)
         self._opcode_table.set(0xF0FF, 0xF033, Opcode_0xF033)
-        self._opcode_table.set(0xF0FF, 0xF055, Opcode_0xF055)
-        self._opcode_table.set(0xF0FF, 0xF065, Opcode_0xF065)
+        self._opcode_table.set(0xF0FF, 0xF055, store_callback)
+        self._opcode_table.set(0xF0FF, 0xF065, load_callback)
+        self._opcode_table.build()
 
-    def _read_program_line(self) -> Uint16:
-        return (self._memory.get(self.registers.pc) << 8) | self._memory.get(self.registers.pc + 1)
+    def _read_program_line(self, addr: Uint16) -> Uint16:
+        return self._memory.fetch(addr)
 
     def _decrypt_opcode(self, opcode: Uint16) -> OpcodeAction:
         return OpcodeAction(
@@ -499,66 +1524,717 @@ class CPU:
             nnn=opcode & 0x0FFF
         )
 
-    def _execute_action(self) -> None:
-        opcode = self._read_program_line()
-        action = self._decrypt_opcode(opcode)
+    def _decode_instruction(self, addr: Uint16) -> OpcodeInstruction:
+        opcode = self._read_program_line(addr)
         entry = self._opcode_table.get(opcode)
+        instruction = OpcodeInstruction(
+            opcode=opcode,
+            callback=entry.callback if opcode and entry else None,
+            action=self._decrypt_opcode(opcode),
+            increments_pc=(opcode & 0xF000) not in CPU_OmitIncrementProgramCounterOpcodes
+        )
+        self._instructions[addr] = instruction
+        return instruction
+
+    def _get_instruction(self, addr: Uint16) -> OpcodeInstruction:
+        instruction = self._instructions.get(addr)
+        if instruction is None:
+            instruction = self._decode_instruction(addr)
+        return instruction
+
+    def _invalidate_instructions(self, addr: Uint16, length: int) -> None:
+        if length >= Memory_DataSize:
+            self._instructions.clear()
+            return
+        for instruction_addr in range(addr - 1, addr + length):
+            self._instructions.pop(instruction_addr, None)
+
+    def _execute_action(self) -> None:
+        pc = self.registers.pc
+        instruction = self._instructions.get(pc)
+        if instruction is None:
+            instruction = self._decode_instruction(pc)
 
-        if opcode and entry:
-            entry.callback(OpcodePayload(
-                self.registers,
-                self._memory,
-                self._display,
-                self._inputs
-            ), action)
+        if instruction.callback:
+            instruction.callback(self._payload, instruction.action)
 
-        self._add_opcode_in_history(opcode)
+        self._history.record(pc, instruction.opcode, self.registers.v)
 
-        if (opcode & 0xF000) not in CPU_OmitIncrementProgramCounterOpcodes:
+        if instruction.increments_pc:
             self.registers.pc += 2
 
-    def _update_time(self) -> None:
-        now = time.perf_counter()
-        if now - self._last_timer_update >= 1 / 60:
-            if self.registers.dt > 0:
-                self.registers.dt -= 1
-            if self.registers.st > 0:
-                self.registers.st -= 1
-                if self.registers.st == 0:
-                    pass
-            self._last_timer_update = now
+    def _execute_block(self, budget: int) -> int:
+        pc = self.registers.pc
+        block = self._blocks.get(pc)
+        if block is None:
+            block = self._recompiler.get(pc)
+        # A block runs whole, so one that does not fit in the frame is interpreted to keep timers on the same instruction.
+        if block is None or len(block.opcodes) > budget:
+            self._execute_action()
+            return 1
+        block.run(self._payload)
+        self._history.record_block(block.addresses, block.opcodes, self.registers.v)
+        self._block_addresses = block.addresses
+        return len(block.opcodes)
+
+    def _update_timers(self, ticks: int) -> None:
+        if self.registers.dt > 0:
+            self.registers.dt = max(self.registers.dt - ticks, 0)
+        if self.registers.st > 0:
+            self.registers.st = max(self.registers.st - ticks, 0)
+
+    def skip_timers(self, ticks: int) -> None:
+        if ticks <= 0:
+            return
+        self._update_timers(ticks)
+        for listener in self._timer_listeners:
+            listener(ticks)
+
+    def add_timer_listener(self, listener: Callable[[int], None]) -> None:
+        self._timer_listeners.append(listener)
 
     def _update_frequency(self, now: float) -> None:
         if now - self._last_frequency_time >= 1.0:
-            self._frequency = self._cycles_executed / (now - self._last_frequency_time)
+            elapsed = now - self._last_frequency_time
+            self._frequency = self._cycles_executed / elapsed
+            self._speed = self._frames_executed / elapsed / CPU_TimerFrequency
             self._cycles_executed = 0
+            self._frames_executed = 0
             self._last_frequency_time = now
 
-    def _add_opcode_in_history(self, opcode: int) -> None:
-        if len(self._opcodes_history) >= CPU_OpcodeHistoryMaxLength:
-            self._opcodes_history = self._opcodes_history[1:]
-        self._opcodes_history.append(opcode)
+    def step(self, budget: int = Recompiler_BlockMaxLength) -> int:
+        if self._recompiler:
+            return self._execute_block(budget)
+        self._execute_action()
+        return 1
+
+    def _step_hooked(self, budget: int = Recompiler_BlockMaxLength) -> int:
+        pc = self.registers.pc
+        start = time.perf_counter()
+        executed = self.step(budget)
+        self._record_step(pc, executed, (time.perf_counter() - start) / executed)
+        return executed
+
+    def _get_step_addresses(self, pc: Uint16, executed: int) -> list[Uint16]:
+        return self._block_addresses if executed > 1 else [pc]
+
+    def _record_step(self, pc: Uint16, executed: int, elapsed: float) -> None:
+        for addr in self._get_step_addresses(pc, executed):
+            instruction = self._get_instruction(addr)
+            if self._profiler:
+                self._profiler.record(addr, instruction.callback, elapsed)
+            if self._trace:
+                self._trace.write(addr, instruction.opcode)
+            if self._coverage:
+                self._coverage.record_execution(addr)
+
+    def _step_checked(self, budget: int) -> int:
+        if self._recompiler:
+            block = self._recompiler.get(self.registers.pc)
+            if block and len(block.opcodes) <= budget and not self._breakpoints.has_address_in(block.addresses[1:]):
+                block.run(self._payload)
+                self._history.record_block(block.addresses, block.opcodes, self.registers.v)
+                self._block_addresses = block.addresses
+                return len(block.opcodes)
+        self._execute_action()
+        return 1
+
+    def _pause(self, reason: str) -> None:
+        self._paused = True
+        self._pause_reason = f"{reason} at {hex(self.registers.pc)}"
+        print(f"[Debugger] Paused: {self._pause_reason}")
+
+    def _run_checked(self, instructions: int) -> int:
+        executed = 0
+        registers = self.registers
+        breakpoints = self._breakpoints
+        hooked = self._profiler or self._trace or self._coverage
+        self._idle = False
+        breakpoints.pop_hit()
+        while executed < instructions:
+            pc = registers.pc
+            if pc != self._resume_pc:
+                reason = breakpoints.check(registers)
+                if reason:
+                    self._pause(reason)
+                    break
+            self._resume_pc = None
+            start = time.perf_counter()
+            count = self._step_checked(instructions - executed)
+            if hooked:
+                self._record_step(pc, count, (time.perf_counter() - start) / count)
+            executed += count
+            reason = breakpoints.pop_hit()
+            if reason:
+                self._pause(reason)
+                break
+        self._cycles_executed += executed
+        self._total_executed += executed
+        return executed
+
+    def _is_idle_loop(self, target: Uint16, origin: Uint16) -> bool:
+        if target == origin:
+            return True
+        if target != origin - 4 or self.registers.dt == 0:
+            return False
+        poll = self._get_instruction(target)
+        test = self._get_instruction(target + 2)
+        jump = self._get_instruction(origin)
+        return (
+            poll.callback is Opcode_0xF007
+            and (test.callback is Opcode_0x3000 or test.callback is Opcode_0x4000)
+            and test.action.x == poll.action.x
+            and jump.callback is Opcode_0x1000
+        )
+
+    def run(self, instructions: int) -> int:
+        if self._paused:
+            return 0
+        if not self._breakpoints.is_empty():
+            return self._run_checked(instructions)
+        self._resume_pc = None
+        executed = 0
+        registers = self.registers
+        step = self._step_hooked if self._profiler or self._trace or self._coverage else self.step
+        self._idle = False
+        while executed < instructions:
+            pc = registers.pc
+            count = step(instructions - executed)
+            executed += count
+            # A recompiled block ends with its jump, so the loop's origin is its last instruction.
+            origin = self._block_addresses[-1] if count > 1 else pc
+            if registers.pc <= origin and self._is_idle_loop(registers.pc, origin):
+                self._idle = True
+                break
+        self._cycles_executed += executed
+        self._total_executed += executed
+        return executed
+
+    def run_frame(self) -> int:
+        if self._paused:
+            return 0
+        self._instruction_budget += self._instructions_per_frame
+        budget = int(self._instruction_budget)
+        executed = self.run(budget)
+        self._instruction_budget -= max(executed, budget)
+        self._update_timers(1)
+        self._frames_executed += 1
+        return executed
+
+    def _run_turbo_slice(self, now: float) -> float:
+        slice_end = now + 1 / CPU_TurboPresentRate
+        while now < slice_end:
+            self.run_frame()
+            now = time.perf_counter()
+        self._next_frame_time = now + CPU_FrameDuration
+        return now
 
     def tick(self) -> None:
         now = time.perf_counter()
-        elapsed = now - self._last_cycle_time
-
-        if elapsed >= CPU_CycleDuration:
-            self._execute_action()
-            self._update_time()
-            self._last_cycle_time = now
-            self._cycles_executed += 1
+        if self._paused:
+            self.skip_due_frames()
+        elif self._turbo:
+            now = self._run_turbo_slice(now)
+        elif now >= self._next_frame_time:
+            due_frames = int((now - self._next_frame_time) / CPU_FrameDuration) + 1
+            executed_frames = min(due_frames, CPU_MaxCatchUpFrames)
+            for _ in range(executed_frames):
+                self.run_frame()
+            self.skip_timers(due_frames - executed_frames)
+            self._next_frame_time += due_frames * CPU_FrameDuration
         self._update_frequency(now)
 
+    def skip_due_frames(self) -> None:
+        now = time.perf_counter()
+        if now >= self._next_frame_time:
+            due_frames = int((now - self._next_frame_time) / CPU_FrameDuration) + 1
+            self._next_frame_time += due_frames * CPU_FrameDuration
+
+    def set_clock_speed(self, clock_speed: float) -> None:
+        self._clock_speed = clock_speed
+        self._instructions_per_frame = clock_speed / CPU_TimerFrequency
+
+    def get_clock_speed(self) -> float:
+        return self._clock_speed
+
+    def set_instruction_budget(self, instruction_budget: float) -> None:
+        self._instruction_budget = instruction_budget
+
+    def get_instruction_budget(self) -> float:
+        return self._instruction_budget
+
+    def get_total_executed(self) -> int:
+        return self._total_executed
+
+    def set_turbo(self, turbo: bool) -> None:
+        self._turbo = turbo
+
+    def is_turbo(self) -> bool:
+        return self._turbo
+
+    def get_speed(self) -> float:
+        return self._speed
+
+    def is_idle(self) -> bool:
+        return self._idle
+
+    def get_breakpoints(self) -> Breakpoints:
+        return self._breakpoints
+
+    def is_paused(self) -> bool:
+        return self._paused
+
+    def get_pause_reason(self) -> str:
+        return self._pause_reason
+
+    def pause(self) -> None:
+        if not self._paused:
+            self._pause("pause")
+
+    def resume(self) -> None:
+        self._paused = False
+        self._resume_pc = self.registers.pc
+        self.skip_due_frames()
+
+    def step_instruction(self) -> None:
+        pc = self.registers.pc
+        start = time.perf_counter()
+        self._execute_action()
+        if self._profiler or self._trace or self._coverage:
+            self._record_step(pc, 1, time.perf_counter() - start)
+        self._total_executed += 1
+        reason = self._breakpoints.pop_hit()
+        self._pause(reason or "step")
+
+    def step_over(self) -> None:
+        if self._get_instruction(self.registers.pc).callback is Opcode_0x2000:
+            self._breakpoints.set_temporary(self.registers.pc + 2)
+            self.resume()
+        else:
+            self.step_instruction()
+
+    def get_next_frame_time(self) -> float:
+        return self._next_frame_time
+
+    def set_profiler(self, profiler: Profiler | None) -> None:
+        self._profiler = profiler
+
+    def get_profiler(self) -> Profiler | None:
+        return self._profiler
+
+    def set_trace(self, trace: TraceWriter | None) -> None:
+        self._trace = trace
+
+    def set_coverage(self, coverage: Coverage | None) -> None:
+        if self._coverage:
+            self._memory.remove_read_listener(self._coverage.record_read)
+            self._memory.remove_write_listener(self._coverage.record_write)
+        self._coverage = coverage
+        if coverage:
+            self._memory.add_read_listener(coverage.record_read)
+            self._memory.add_write_listener(coverage.record_write)
+
+    def get_coverage(self) -> Coverage | None:
+        return self._coverage
+
+    def get_trace(self) -> TraceWriter | None:
+        return self._trace
+
+    def get_opcode_table(self) -> OpcodeTable:
+        return self._opcode_table
+
+    def get_quirks(self) -> QuirkProfile:
+        return self._quirks
+
+    def set_quirks(self, name: str) -> None:
+        self._quirks = get_quirk_profile(name)
+        self._opcode_table = OpcodeTable()
+        self._init_opcode_table()
+        self._instructions.clear()
+        if self._recompiler:
+            self._recompiler.invalidate(0, Memory_DataSize)
+
+    def translate(self, entry: Uint16 = Registers_FirstProgramCounterAdress) -> str:
+        return Recompiler(self._get_instruction, False).translate(entry)
+
+    def install_translation(self, blocks: list) -> int:
+        if self._recompiler is None:
+            raise Exception("[AotError] the CPU was created without ahead-of-time support")
+        return self._recompiler.install(blocks)
+
     def get_frequency(self) -> int:
         return self._frequency
 
-    def get_opcodes_history(self) -> list[int]:
-        return self._opcodes_history
+    def get_history(self) -> OpcodeHistory:
+        return self._history
+
+Aot_Version = 2
+Aot_DefaultCachePath = os.path.join(os.path.expanduser("~"), ".cache", "chip8-emu", "aot")
+Aot_ModulePrefix = "chip8_aot_"
+
+class AotCache:
+    _path: str
+    _emulator_version: str | None = None
+
+    def __init__(self, path: str = Aot_DefaultCachePath):
+        self._path = path
+
+    def _get_emulator_version(self) -> str:
+        if self._emulator_version is None:
+            digest = hashlib.sha1(str(Aot_Version).encode())
+            try:
+                with open(__file__, "rb") as f:
+                    digest.update(f.read())
+            except OSError:
+                pass
+            self._emulator_version = digest.hexdigest()[:12]
+        return self._emulator_version
+
+    def get_module_path(self, rom: bytes, quirks: str = Quirks_DefaultProfile) -> str:
+        rom_hash = hashlib.sha1(rom).hexdigest()
+        return os.path.join(self._path, f"{Aot_ModulePrefix}{rom_hash}_{self._get_emulator_version()}_{quirks.replace('-', '_')}.py")
+
+    def _import(self, path: str):
+        name = os.path.splitext(os.path.basename(path))[0]
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        module.__dict__.update((name, value) for name, value in globals().items() if name.startswith("Opcode"))
+        spec.loader.exec_module(module)
+        return module
+
+    def load(self, cpu: CPU, rom: bytes) -> list:
+        path = self.get_module_path(rom, cpu.get_quirks().name)
+        if not os.path.isfile(path):
+            os.makedirs(self._path, exist_ok=True)
+            temporary_path = f"{path}.{os.getpid()}.tmp"
+            with open(temporary_path, "w") as f:
+                f.write(cpu.translate())
+            os.replace(temporary_path, path)
+        return self._import(path).BLOCKS
+
+SaveState_Magic = b"C8SS"
+SaveState_Version = 1
+SaveState_Header = struct.Struct(">4sB")
+SaveState_Registers = struct.Struct(f">{Registers_VLength}iIHbii{Registers_StackLength}Hd")
+SaveState_Rows = struct.Struct(f">{Display_PixelOnHeight}QH")
+SaveState_Size = SaveState_Header.size + SaveState_Registers.size + Memory_DataSize + SaveState_Rows.size
+
+class Machine:
+    memory: Memory
+    display: Display
+    inputs: Inputs
+    cpu: CPU
+    _aot_cache: AotCache | None = None
+    _translation: list
+    _quirks_database: dict[str, str]
+
+    def __init__(
+        self,
+        display_backend: DisplayBackend | None = None,
+        inputs_backend: InputsBackend | None = None,
+        recompiler: bool = False,
+        clock_speed: float = CPU_DefaultClockSpeed,
+        history_depth: int = OpcodeHistory_DefaultDepth,
+        seed: int | None = None,
+        bounds_policy: str = Memory_BoundsCount,
+        aot_cache_path: str | None = None,
+        quirks: str = Quirks_DefaultProfile,
+        quirks_database: dict[str, str] | None = None
+    ):
+        self.memory = Memory(bounds_policy)
+        self.display = Display(display_backend)
+        self.inputs = Inputs(inputs_backend)
+        self.cpu = CPU(
+            self.memory,
+            self.display,
+            self.inputs,
+            recompiler=recompiler,
+            clock_speed=clock_speed,
+            history_depth=history_depth,
+            seed=seed,
+            aot=aot_cache_path is not None,
+            quirks=quirks
+        )
+        self._translation = []
+        self._quirks_database = quirks_database or {}
+        if aot_cache_path is not None:
+            self._aot_cache = AotCache(aot_cache_path)
+
+    def _prepare_rom(self, rom: bytes) -> None:
+        quirks = self._quirks_database.get(hashlib.sha1(rom).hexdigest())
+        if quirks and quirks != self.cpu.get_quirks().name:
+            self.cpu.set_quirks(quirks)
+        if self._aot_cache:
+            self._translation = self._aot_cache.load(self.cpu, rom)
+            self.cpu.install_translation(self._translation)
+
+    def has_aot_cache(self) -> bool:
+        return self._aot_cache is not None
+
+    def load_rom(self, rom: bytes) -> None:
+        self.memory.set_many(rom, Registers_FirstProgramCounterAdress)
+        self._prepare_rom(bytes(rom))
+
+    def load_rom_file(self, path: str) -> int:
+        length = self.memory.load_file(path, Registers_FirstProgramCounterAdress)
+        rom_end = Registers_FirstProgramCounterAdress + length
+        self._prepare_rom(bytes(self.memory.get_view()[Registers_FirstProgramCounterAdress:rom_end]))
+        return length
+
+    def run(self, instructions: int) -> int:
+        return self.cpu.run(instructions)
+
+    def run_frames(self, frames: int) -> int:
+        executed = 0
+        for _ in range(frames):
+            executed += self.cpu.run_frame()
+        return executed
+
+    def save_state(self) -> bytes:
+        registers = self.cpu.registers
+        keys = self.inputs.get_keys_mask()
+        return b"".join((
+            SaveState_Header.pack(SaveState_Magic, SaveState_Version),
+            SaveState_Registers.pack(
+                *registers.v, registers.i, registers.pc, registers.sp, registers.dt, registers.st, *registers.stack,
+                self.cpu.get_instruction_budget()
+            ),
+            self.memory.get_view(),
+            SaveState_Rows.pack(*self.display.get_rows(), keys),
+        ))
+
+    def load_state(self, state: bytes) -> None:
+        magic, version = SaveState_Header.unpack_from(state)
+        if magic != SaveState_Magic or version != SaveState_Version or len(state) != SaveState_Size:
+            raise Exception(f"[StateError] not a version {SaveState_Version} save state")
+        offset = SaveState_Header.size
+        values = SaveState_Registers.unpack_from(state, offset)
+        offset += SaveState_Registers.size
+        registers = self.cpu.registers
+        registers.v[:] = values[:Registers_VLength]
+        registers.i, registers.pc, registers.sp, registers.dt, registers.st = values[Registers_VLength:Registers_VLength + 5]
+        registers.stack[:] = values[Registers_VLength + 5:-1]
+        self.cpu.set_instruction_budget(values[-1])
+        self.memory.set_many(state[offset:offset + Memory_DataSize], 0)
+        offset += Memory_DataSize
+        values = SaveState_Rows.unpack_from(state, offset)
+        self.display.set_rows(values[:Display_PixelOnHeight])
+        self.inputs.set_keys_mask(values[Display_PixelOnHeight])
+        if self._translation:
+            self.cpu.install_translation(self._translation)
+
+RewindBuffer_DefaultSeconds = 10
+RewindBuffer_SnapshotRate = 10
+
+class RewindBuffer:
+    _machine: Machine
+    _deltas: deque[bytes]
+    _latest: bytes | None
+    _next_snapshot_time: float
+
+    def __init__(self, machine: Machine, seconds: float = RewindBuffer_DefaultSeconds):
+        self._machine = machine
+        self._deltas = deque(maxlen=max(1, int(seconds * RewindBuffer_SnapshotRate)))
+        self._latest = None
+        self._next_snapshot_time = 0.0
+
+    def _xor(self, a: bytes, b: bytes) -> bytes:
+        return (int.from_bytes(a, "big") ^ int.from_bytes(b, "big")).to_bytes(SaveState_Size, "big")
+
+    def capture(self) -> None:
+        state = self._machine.save_state()
+        if self._latest is not None:
+            self._deltas.append(zlib.compress(self._xor(self._latest, state), 1))
+        self._latest = state
+
+    def update(self, now: float) -> None:
+        if now >= self._next_snapshot_time:
+            self.capture()
+            self._next_snapshot_time = now + 1 / RewindBuffer_SnapshotRate
+
+    def rewind(self) -> bool:
+        if self._latest is None:
+            return False
+        if self._deltas:
+            self._latest = self._xor(self._latest, zlib.decompress(self._deltas.pop()))
+        self._machine.load_state(self._latest)
+        return True
+
+    def get_length(self) -> int:
+        return len(self._deltas)
+
+InputLog_Version = 3
+
+class InputRecorder:
+    _machine: Machine
+    _seed: int
+    _recompiler: bool
+    _events: list[tuple[int, int, bool]]
+    _timer_skips: list[tuple[int, int]]
+    _invalid_reason: str = ""
+
+    def __init__(self, machine: Machine, seed: int, recompiler: bool = False):
+        self._machine = machine
+        self._seed = seed
+        self._recompiler = recompiler
+        self._events = []
+        self._timer_skips = []
+        machine.inputs.add_key_listener(self._record)
+        machine.cpu.add_timer_listener(self._record_timer_skip)
+
+    def _record(self, key: int, pressed: bool) -> None:
+        self._events.append((self._machine.cpu.get_total_executed(), key, pressed))
+
+    def _record_timer_skip(self, ticks: int) -> None:
+        self._timer_skips.append((self._machine.cpu.get_total_executed(), ticks))
+
+    def invalidate(self, reason: str) -> None:
+        # Pausing, stepping, rewinding and loading a state move the machine outside of whole frames, which a replay cannot follow.
+        if not self._invalid_reason:
+            self._invalid_reason = reason
+            print(f"[Record Error]: {reason}, the session will not be saved")
+
+    def is_valid(self) -> bool:
+        return not self._invalid_reason
+
+    def save(self, path: str) -> None:
+        if self._invalid_reason:
+            raise Exception(f"[RecordError] The session cannot be replayed: {self._invalid_reason}")
+        log = {
+            "version": InputLog_Version,
+            "seed": self._seed,
+            "clock_speed": self._machine.cpu.get_clock_speed(),
+            "recompiler": self._recompiler,
+            "aot": self._machine.has_aot_cache(),
+            "quirks": self._machine.cpu.get_quirks().name,
+            "bounds_policy": self._machine.memory.get_bounds_policy(),
+            "instructions": self._machine.cpu.get_total_executed(),
+            "framebuffer_hash": self._machine.display.get_hash(),
+            "events": self._events,
+            "timer_skips": self._timer_skips,
+        }
+        with open(path, "w") as f:
+            json.dump(log, f)
+
+@dataclass
+class ReplayResult:
+    instructions: int
+    frames: int
+    wall_time: float
+    framebuffer_hash: str
+    matches: bool
+
+class InputReplayer:
+    _log: dict
+    _machine: Machine
+
+    def __init__(self, rom: bytes, log_path: str, aot_cache_path: str = Aot_DefaultCachePath):
+        with open(log_path, "r") as f:
+            self._log = json.load(f)
+        if self._log.get("version") != InputLog_Version:
+            raise Exception(f"[ReplayError] {log_path} is not a version {InputLog_Version} input log")
+        self._machine = Machine(
+            recompiler=self._log["recompiler"],
+            clock_speed=self._log["clock_speed"],
+            seed=self._log["seed"],
+            quirks=self._log.get("quirks", Quirks_DefaultProfile),
+            bounds_policy=self._log.get("bounds_policy", Memory_BoundsCount),
+            aot_cache_path=aot_cache_path if self._log["aot"] else None
+        )
+        self._machine.load_rom(rom)
+
+    def run(self) -> ReplayResult:
+        cpu = self._machine.cpu
+        inputs = self._machine.inputs
+        events = self._log["events"]
+        timer_skips = self._log["timer_skips"]
+        target = self._log["instructions"]
+        next_event = 0
+        next_timer_skip = 0
+        frames = 0
+        start = time.perf_counter()
+        while cpu.get_total_executed() < target:
+            while next_timer_skip < len(timer_skips) and timer_skips[next_timer_skip][0] <= cpu.get_total_executed():
+                cpu.skip_timers(timer_skips[next_timer_skip][1])
+                next_timer_skip += 1
+            while next_event < len(events) and events[next_event][0] <= cpu.get_total_executed():
+                _, key, pressed = events[next_event]
+                if pressed:
+                    inputs.press_key(key)
+                else:
+                    inputs.release_key(key)
+                next_event += 1
+            cpu.run_frame()
+            frames += 1
+        framebuffer_hash = self._machine.display.get_hash()
+        return ReplayResult(
+            instructions=cpu.get_total_executed(),
+            frames=frames,
+            wall_time=time.perf_counter() - start,
+            framebuffer_hash=framebuffer_hash,
+            matches=framebuffer_hash == self._log["framebuffer_hash"] and cpu.get_total_executed() == target
+        )
+
+    def get_machine(self) -> Machine:
+        return self._machine
+
+FrameScheduler_SpinDuration = 0.001
+FrameScheduler_StatsPeriod = 1.0
+
+@dataclass
+class FrameSchedulerStats:
+    mean: float
+    deviation: float
+    max: float
+
+class FrameScheduler:
+    _samples_count: int = 0
+    _lateness_total: float = 0.0
+    _lateness_squares_total: float = 0.0
+    _lateness_max: float = 0.0
+    _last_stats_time: float
+    _stats: FrameSchedulerStats
+
+    def __init__(self):
+        self._last_stats_time = time.perf_counter()
+        self._stats = FrameSchedulerStats(0.0, 0.0, 0.0)
+
+    def _add_sample(self, lateness: float, now: float) -> None:
+        self._samples_count += 1
+        self._lateness_total += lateness
+        self._lateness_squares_total += lateness * lateness
+        self._lateness_max = max(self._lateness_max, lateness)
+        if now - self._last_stats_time >= FrameScheduler_StatsPeriod:
+            mean = self._lateness_total / self._samples_count
+            variance = max(self._lateness_squares_total / self._samples_count - mean * mean, 0.0)
+            self._stats = FrameSchedulerStats(mean, math.sqrt(variance), self._lateness_max)
+            self._samples_count = 0
+            self._lateness_total = 0.0
+            self._lateness_squares_total = 0.0
+            self._lateness_max = 0.0
+            self._last_stats_time = now
+
+    def wait_until(self, deadline: float) -> None:
+        remaining = deadline - time.perf_counter()
+        if remaining > FrameScheduler_SpinDuration:
+            time.sleep(remaining - FrameScheduler_SpinDuration)
+        now = time.perf_counter()
+        while now < deadline:
+            now = time.perf_counter()
+        self._add_sample(now - deadline, now)
+
+    def get_stats(self) -> FrameSchedulerStats:
+        return self._stats
 
 Debugger_FontSize = 20
 Debugger_Color = "green"
 Debugger_BackgroundColor = "#000000"
+Debugger_HistoryLength = 10
+Debugger_RefreshRate = 10
+Debugger_HeatmapWidth = 64
+Debugger_HeatmapHeight = Memory_DataSize // Debugger_HeatmapWidth
+Debugger_HeatmapCellSize = 4
+Debugger_HeatmapMargin = 5
 
 class Debugger:
     _memory: Memory
@@ -566,33 +2242,67 @@ class Debugger:
     _inputs: Inputs
     _registers: Registers
     _cpu: CPU
+    _screen: pygame.Surface
+    _scheduler: FrameScheduler
     _font: pygame.font.Font
+    _layer: pygame.Surface
+    _lines: dict[int, str]
+    _line_surfaces: dict[int, pygame.Surface]
+    _heatmap: pygame.Surface | None = None
+    _heatmap_pixels: bytes = b""
 
     _displayed = False
+    _layer_dirty = False
+    _next_refresh_time: float = 0.0
 
     def __init__(
         self,
         memory: Memory,
         display: Display,
         inputs: Inputs,
-        cpu: CPU
+        cpu: CPU,
+        screen: pygame.Surface,
+        scheduler: FrameScheduler
     ):
         self._memory = memory
         self._display = display
         self._inputs = inputs
         self._registers = cpu.registers
         self._cpu = cpu
+        self._screen = screen
+        self._scheduler = scheduler
         self._font = pygame.font.SysFont(None, Debugger_FontSize)
+        self._layer = pygame.Surface(screen.get_size(), pygame.SRCALPHA)
+        self._lines = {}
+        self._line_surfaces = {}
 
     def _draw_text(self, text: str, top: int) -> None:
-        text_surface = self._font.render(
+        if self._lines.get(top) == text:
+            return
+        self._lines[top] = text
+        self._line_surfaces[top] = self._font.render(
             text,
             True,
             pygame.Color(Debugger_Color),
             pygame.Color(Debugger_BackgroundColor)
         )
-        text_rect = text_surface.get_rect(topleft=(5,top))
-        self._display.screen.blit(text_surface, text_rect)
+        self._layer_dirty = True
+
+    def _clear_text(self, top: int) -> None:
+        if self._lines.pop(top, None) is None:
+            return
+        del self._line_surfaces[top]
+        self._layer_dirty = True
+
+    def _compose_layer(self) -> None:
+        self._layer.fill((0, 0, 0, 0))
+        for top, text_surface in self._line_surfaces.items():
+            self._layer.blit(text_surface, text_surface.get_rect(topleft=(5,top)))
+        if self._heatmap:
+            self._layer.blit(self._heatmap, self._heatmap.get_rect(
+                bottomright=(self._layer.get_width() - Debugger_HeatmapMargin, self._layer.get_height() - Debugger_HeatmapMargin)
+            ))
+        self._layer_dirty = False
 
     def _draw_v_registers_text(self) -> None:
         registers_text = "[V]: " + ", ".join(str(val) for val in self._registers.v) + ";"
@@ -607,66 +2317,404 @@ class Debugger:
         self._draw_text(registers_text, 35)
 
     def _draw_cpu_frequency_text(self) -> None:
-        frequency_text = f"[Frequency]: {round(self._cpu.get_frequency(), 3)}Hz"
+        frequency_text = f"[Frequency]: {round(self._cpu.get_frequency(), 3)}Hz (target: {round(self._cpu.get_clock_speed(), 3)}Hz)"
         self._draw_text(frequency_text, 50)
 
     def _draw_last_opcodes(self) -> None:
-        opcodes_text = "[Opcodes history]: " + ", ".join(hex(val) for val in self._cpu.get_opcodes_history()) + ";"
+        opcodes_text = "[Opcodes history]: " + ", ".join(hex(val) for val in self._cpu.get_history().get_opcodes(Debugger_HistoryLength)) + ";"
         self._draw_text(opcodes_text, 65)
 
+    def _draw_speed_text(self) -> None:
+        mode_text = " (turbo)" if self._cpu.is_turbo() else ""
+        speed_text = f"[Speed]: x{round(self._cpu.get_speed(), 2)}{mode_text}; quirks: {self._cpu.get_quirks().name};"
+        self._draw_text(speed_text, 95)
+
+    def _draw_frame_jitter_text(self) -> None:
+        stats = self._scheduler.get_stats()
+        jitter_text = f"[Jitter]: mean: {round(stats.mean * 1000, 3)}ms; deviation: {round(stats.deviation * 1000, 3)}ms; max: {round(stats.max * 1000, 3)}ms;"
+        self._draw_text(jitter_text, 110)
+
+    def _draw_profiler_text(self) -> None:
+        profiler = self._cpu.get_profiler()
+        if profiler is None:
+            return
+        total_time = profiler.get_total_time() or 1.0
+        families_text = "[Hot opcodes]: " + ", ".join(f"{entry.key} x{entry.count} ({round(entry.time / total_time * 100, 1)}%)" for entry in profiler.get_top_families()) + ";"
+        addresses_text = "[Hot addresses]: " + ", ".join(f"{entry.key} x{entry.count} ({round(entry.time / total_time * 100, 1)}%)" for entry in profiler.get_top_addresses()) + ";"
+        self._draw_text(families_text, 125)
+        self._draw_text(addresses_text, 140)
+
+    def _draw_coverage(self) -> None:
+        coverage = self._cpu.get_coverage()
+        if coverage is None:
+            return
+        channels = [coverage.get_written(), coverage.get_executed(), coverage.get_read()]
+        coverage_text = "[Coverage]: " + "; ".join(
+            f"{name}: {sum(1 for count in counts if count)} bytes" for name, counts in zip(["written", "executed", "read"], channels)
+        ) + ";"
+        self._draw_text(coverage_text, 155)
+        scales = [255 / math.log1p(max(counts)) if max(counts) else 0 for counts in channels]
+        pixels = bytes(int(math.log1p(count) * scale) for counts in zip(*channels) for count, scale in zip(counts, scales))
+        if pixels == self._heatmap_pixels:
+            return
+        self._heatmap_pixels = pixels
+        heatmap = pygame.image.frombuffer(pixels, (Debugger_HeatmapWidth, Debugger_HeatmapHeight), "RGB")
+        self._heatmap = pygame.transform.scale(heatmap, (
+            Debugger_HeatmapWidth * Debugger_HeatmapCellSize, Debugger_HeatmapHeight * Debugger_HeatmapCellSize
+        ))
+        self._layer_dirty = True
+
     def _draw_keys_pressed(self) -> None:
-        keys_pressed_text = "[Keys]: " + ", ".join(f"({hex(index)})->{1 if val else 0}" for index, val in enumerate(self._inputs.get_all_keys_pressed())) + ";"
+        keys_mask = self._inputs.get_keys_mask()
+        keys_pressed_text = "[Keys]: " + ", ".join(f"({hex(index)})->{keys_mask >> index & 1}" for index in range(Inputs_KeysPressedlength)) + ";"
         self._draw_text(keys_pressed_text, 80)
 
+    def _draw_breakpoints_text(self) -> None:
+        breakpoints = self._cpu.get_breakpoints()
+        if breakpoints.is_empty() and not self._cpu.is_paused():
+            self._clear_text(170)
+            return
+        state_text = f"paused ({self._cpu.get_pause_reason()})" if self._cpu.is_paused() else "running"
+        breakpoints_text = f"[Debug]: {state_text}; breakpoints: " + ", ".join(breakpoints.describe()) + ";"
+        self._draw_text(breakpoints_text, 170)
+
     def _toggle_displayed(self) -> None:
         if self._inputs.is_free_key_just_pressed(pygame.K_LSHIFT):
             self._displayed = not self._displayed
+            self._display.invalidate()
+
+    def _control_execution(self) -> None:
+        cpu = self._cpu
+        if self._inputs.is_free_key_just_pressed(pygame.K_F4):
+            pc = cpu.registers.pc
+            added = cpu.get_breakpoints().toggle_address(pc)
+            print(f"[Debugger] Breakpoint {'set' if added else 'removed'} at {hex(pc)}")
+        if self._inputs.is_free_key_just_pressed(pygame.K_F6):
+            if cpu.is_paused():
+                cpu.resume()
+            else:
+                cpu.pause()
+        elif cpu.is_paused() and self._inputs.is_free_key_just_pressed(pygame.K_F7):
+            cpu.step_instruction()
+            self._next_refresh_time = 0.0
+        elif cpu.is_paused() and self._inputs.is_free_key_just_pressed(pygame.K_F8):
+            cpu.step_over()
+            self._next_refresh_time = 0.0
+        if cpu.is_paused() and not self._displayed:
+            self._displayed = True
+            self._display.invalidate()
+
+    def _refresh(self) -> None:
+        self._draw_v_registers_text()
+        self._draw_special_registers_text()
+        self._draw_stack_register_text()
+        self._draw_cpu_frequency_text()
+        self._draw_last_opcodes()
+        self._draw_keys_pressed()
+        self._draw_speed_text()
+        self._draw_frame_jitter_text()
+        self._draw_profiler_text()
+        self._draw_coverage()
+        self._draw_breakpoints_text()
+        if self._layer_dirty:
+            self._compose_layer()
+            self._display.invalidate()
 
     def update(self) -> None:
-        if self._displayed:
-            self._draw_v_registers_text()
-            self._draw_special_registers_text()
-            self._draw_stack_register_text()
-            self._draw_cpu_frequency_text()
-            self._draw_last_opcodes()
-            self._draw_keys_pressed()
         self._toggle_displayed()
+        self._control_execution()
+        if not self._displayed:
+            return
+        now = time.perf_counter()
+        if now >= self._next_refresh_time:
+            self._next_refresh_time = now + 1 / Debugger_RefreshRate
+            self._refresh()
+
+    def draw(self) -> None:
+        if self._displayed:
+            self._screen.blit(self._layer, (0, 0))
+
+App_DefaultProfilePath = "profile.json"
+App_DefaultTracePath = "trace.c8t"
+App_StateExtension = ".state"
+App_DefaultRecordPath = "session.json"
+App_DefaultQuirksDatabasePath = "quirks.json"
+App_DefaultCoveragePath = "coverage.json"
+
+class Arguments:
+    args: list[str]
+    rom_path: str = ""
+    recompiler: bool = False
+    clock_speed: float = CPU_DefaultClockSpeed
+    turbo: bool = False
+    profile_path: str = ""
+    history_depth: int = OpcodeHistory_DefaultDepth
+    trace_path: str = ""
+    rewind_seconds: float = 0
+    seed: int | None = None
+    record_path: str = ""
+    replay_path: str = ""
+    keymap_path: str = ""
+    bounds_policy: str = Memory_BoundsCount
+    aot_cache_path: str | None = None
+    quirks: str = ""
+    quirks_database_path: str = ""
+    coverage_path: str = ""
+    breakpoints: list[str]
+    conditions: list[str]
+    watchpoints: list[str]
+
+    def __init__(self):
+        self._get_arguments()
+
+    def _get_arguments(self) -> None:
+        self.args = sys.argv[1:]
+        self.rom_path = self.args[0]
+        _, self.recompiler = self._get_optional_argument("recompiler")
+        self.clock_speed = self._get_clock_speed()
+        _, self.turbo = self._get_optional_argument("turbo")
+        profile_path, has_profile = self._get_optional_argument("profile", App_DefaultProfilePath)
+        self.profile_path = profile_path if has_profile else ""
+        history_depth, _ = self._get_optional_argument("history", str(OpcodeHistory_DefaultDepth))
+        self.history_depth = int(history_depth)
+        trace_path, has_trace = self._get_optional_argument("trace", App_DefaultTracePath)
+        self.trace_path = trace_path if has_trace else ""
+        rewind_seconds, has_rewind = self._get_optional_argument("rewind", str(RewindBuffer_DefaultSeconds))
+        self.rewind_seconds = float(rewind_seconds) if has_rewind else 0
+        seed, has_seed = self._get_optional_argument("seed")
+        self.seed = int(seed) if has_seed and seed else None
+        record_path, has_record = self._get_optional_argument("record", App_DefaultRecordPath)
+        self.record_path = record_path if has_record else ""
+        replay_path, has_replay = self._get_optional_argument("replay", App_DefaultRecordPath)
+        self.replay_path = replay_path if has_replay else ""
+        self.keymap_path, _ = self._get_optional_argument("keymap")
+        self.bounds_policy, _ = self._get_optional_argument("bounds", Memory_BoundsCount)
+        aot_cache_path, has_aot = self._get_optional_argument("aot", Aot_DefaultCachePath)
+        self.aot_cache_path = aot_cache_path if has_aot else None
+        self.quirks, _ = self._get_optional_argument("quirks")
+        quirks_database_path, has_quirks_database = self._get_optional_argument("quirks-db", App_DefaultQuirksDatabasePath)
+        self.quirks_database_path = quirks_database_path if has_quirks_database else ""
+        coverage_path, has_coverage = self._get_optional_argument("coverage", App_DefaultCoveragePath)
+        self.coverage_path = coverage_path if has_coverage else ""
+        self.breakpoints = self._get_list_argument("break")
+        self.conditions = self._get_list_argument("break-if")
+        self.watchpoints = self._get_list_argument("watch")
+
+    def _get_list_argument(self, flag: str) -> list[str]:
+        values, _ = self._get_optional_argument(flag)
+        return [value for value in values.split(",") if value.strip()]
+
+    def _get_clock_speed(self) -> float:
+        instructions_per_frame, has_instructions_per_frame = self._get_optional_argument("ipf")
+        clock_speed, has_clock_speed = self._get_optional_argument("clock")
+        if has_instructions_per_frame and has_clock_speed:
+            raise Exception("[ArgumentError] --ipf and --clock cannot be used together")
+        if has_instructions_per_frame:
+            return float(instructions_per_frame) * CPU_TimerFrequency
+        if has_clock_speed:
+            return float(clock_speed)
+        return CPU_DefaultClockSpeed
+
+    def _get_optional_argument(self, flag: str, default_value: str = "") -> tuple[str, bool]:
+        for index, arg in enumerate(self.args):
+            if arg == f"--{flag}":
+                if index == len(self.args) - 1 or self.args[index + 1].startswith("--"):
+                    return (default_value, True)
+                return (self.args[index + 1], True)
+        return (default_value, False)
 
 class App:
-    _memory = Memory()
-    _display = Display()
-    _inputs = Inputs()
+    _machine: Machine
+    _memory: Memory
+    _display: Display
+    _inputs: Inputs
 
     _cpu: CPU
     _debugger: Debugger
+    _scheduler: FrameScheduler
     _last_timer_update: float
+    _profile_path: str
+    _state_path: str = ""
+    _rewind: RewindBuffer | None = None
+    _recorder: InputRecorder | None = None
+    _record_path: str = ""
+    _coverage_path: str = ""
 
-    def __init__(self):
-        self._cpu = CPU(self._memory, self._display, self._inputs)
-        self._debugger = Debugger(self._memory, self._display, self._inputs, self._cpu)
+    def __init__(
+        self,
+        recompiler: bool = False,
+        clock_speed: float = CPU_DefaultClockSpeed,
+        turbo: bool = False,
+        profile_path: str = "",
+        history_depth: int = OpcodeHistory_DefaultDepth,
+        trace_path: str = "",
+        rewind_seconds: float = 0,
+        seed: int | None = None,
+        record_path: str = "",
+        keymap_path: str = "",
+        bounds_policy: str = Memory_BoundsCount,
+        aot_cache_path: str | None = None,
+        quirks: str = "",
+        quirks_database_path: str = "",
+        coverage_path: str = "",
+        breakpoints: list[str] | None = None,
+        conditions: list[str] | None = None,
+        watchpoints: list[str] | None = None
+    ):
+        if record_path and seed is None:
+            seed = random.randrange(1 << 32)
+        display_backend = PygameDisplayBackend()
+        inputs_backend = PygameInputsBackend(load_keymap(keymap_path) if keymap_path else None)
+        quirks_database = load_quirks_database(quirks_database_path) if quirks_database_path and not quirks else None
+        self._machine = Machine(
+            display_backend,
+            inputs_backend,
+            recompiler=recompiler,
+            clock_speed=clock_speed,
+            history_depth=history_depth,
+            seed=seed,
+            bounds_policy=bounds_policy,
+            aot_cache_path=aot_cache_path,
+            quirks=quirks or Quirks_DefaultProfile,
+            quirks_database=quirks_database
+        )
+        self._memory = self._machine.memory
+        self._display = self._machine.display
+        self._inputs = self._machine.inputs
+        self._cpu = self._machine.cpu
+        self._scheduler = FrameScheduler()
+        self._debugger = Debugger(self._memory, self._display, self._inputs, self._cpu, display_backend.screen, self._scheduler)
+        self._cpu.set_turbo(turbo)
+        self._profile_path = profile_path
+        if profile_path:
+            self._cpu.set_profiler(Profiler())
+        if trace_path:
+            self._cpu.set_trace(TraceWriter(trace_path))
+        if rewind_seconds > 0:
+            self._rewind = RewindBuffer(self._machine, rewind_seconds)
+        if record_path:
+            self._recorder = InputRecorder(self._machine, seed, recompiler)
+            self._record_path = record_path
+        self._coverage_path = coverage_path
+        cpu_breakpoints = self._cpu.get_breakpoints()
+        for addr in breakpoints or []:
+            cpu_breakpoints.add_address(int(addr, 0))
+        for condition in conditions or []:
+            cpu_breakpoints.add_condition(condition)
+        for watchpoint in watchpoints or []:
+            cpu_breakpoints.add_watchpoint(watchpoint)
         self._last_timer_update = time.perf_counter()
 
+    def _toggle_turbo(self) -> None:
+        if self._inputs.is_free_key_just_pressed(pygame.K_TAB):
+            self._cpu.set_turbo(not self._cpu.is_turbo())
+
+    def _dump_profile(self) -> None:
+        profiler = self._cpu.get_profiler()
+        if profiler and self._inputs.is_free_key_just_pressed(pygame.K_F2):
+            profiler.dump(self._profile_path)
+            print(f"[Profiler] Report written to {self._profile_path}")
+
+    def _dump_coverage(self) -> None:
+        coverage = self._cpu.get_coverage()
+        if coverage:
+            coverage.dump(self._coverage_path)
+            print(f"[Coverage] Report written to {self._coverage_path}")
+
+    def _save_or_load_state(self) -> None:
+        try:
+            if self._inputs.is_free_key_just_pressed(pygame.K_F5):
+                with open(self._state_path, "wb") as f:
+                    f.write(self._machine.save_state())
+                print(f"[State] Saved to {self._state_path}")
+            elif self._inputs.is_free_key_just_pressed(pygame.K_F9):
+                with open(self._state_path, "rb") as f:
+                    self._machine.load_state(f.read())
+                print(f"[State] Loaded from {self._state_path}")
+                if self._recorder:
+                    self._recorder.invalidate("a state was loaded")
+        except Exception as e:
+            print(f"[State Error]: {str(e)}")
+
+    def _tick(self) -> None:
+        if self._rewind is None:
+            self._cpu.tick()
+        elif self._inputs.is_free_key_pressed(pygame.K_BACKSPACE):
+            self._rewind.rewind()
+            self._cpu.skip_due_frames()
+            if self._recorder:
+                self._recorder.invalidate("the session was rewound")
+        else:
+            self._cpu.tick()
+            self._rewind.update(time.perf_counter())
+
     def _cycle(self) -> None:
-        self._display.update()
         self._inputs.update()
-        self._cpu.tick()
+        self._toggle_turbo()
+        self._dump_profile()
+        if self._inputs.is_free_key_just_pressed(pygame.K_F3):
+            self._dump_coverage()
+        self._save_or_load_state()
+        self._tick()
         self._debugger.update()
-        pygame.display.flip()
+        if self._recorder and self._cpu.is_paused():
+            self._recorder.invalidate("the CPU was paused")
+        if self._display.update():
+            self._debugger.draw()
+            pygame.display.flip()
 
     def _load_rom(self, path: str) -> None:
         try:
-            with open(path, "rb") as f:
-                self._memory.set_many(f.read(), Registers_FirstProgramCounterAdress)
+            self._machine.load_rom_file(path)
         except Exception as e:
             print(f"Failed to load rom \"{path}\": {str(e)}")
+        if self._coverage_path:
+            self._cpu.set_coverage(Coverage())
 
     def start(self, rom_path: str) -> None:
+        self._state_path = rom_path + App_StateExtension
         self._load_rom(rom_path)
         while not self._inputs.should_quit():
             self._cycle()
-
-pygame.init()
+            if not self._cpu.is_turbo():
+                self._scheduler.wait_until(self._cpu.get_next_frame_time())
+        trace = self._cpu.get_trace()
+        if trace:
+            trace.close()
+        if self._recorder and self._recorder.is_valid():
+            self._recorder.save(self._record_path)
+            print(f"[Record] Inputs written to {self._record_path}")
+        self._dump_coverage()
+
+def replay(rom_path: str, log_path: str, aot_cache_path: str | None = None) -> bool:
+    with open(rom_path, "rb") as f:
+        result = InputReplayer(f.read(), log_path, aot_cache_path or Aot_DefaultCachePath).run()
+    print(f"[Replay] {result.instructions} instructions, {result.frames} frames in {round(result.wall_time, 3)}s")
+    print(f"[Replay] framebuffer {result.framebuffer_hash}: {'match' if result.matches else 'MISMATCH'}")
+    return result.matches
 
 if __name__ == "__main__":
-    app = App()
-    app.start(sys.argv[1])
+    arguments = Arguments()
+    if arguments.replay_path:
+        sys.exit(0 if replay(arguments.rom_path, arguments.replay_path, arguments.aot_cache_path) else 1)
+    app = App(
+        recompiler=arguments.recompiler,
+        clock_speed=arguments.clock_speed,
+        turbo=arguments.turbo,
+        profile_path=arguments.profile_path,
+        history_depth=arguments.history_depth,
+        trace_path=arguments.trace_path,
+        rewind_seconds=arguments.rewind_seconds,
+        seed=arguments.seed,
+        record_path=arguments.record_path,
+        keymap_path=arguments.keymap_path,
+        bounds_policy=arguments.bounds_policy,
+        aot_cache_path=arguments.aot_cache_path,
+        quirks=arguments.quirks,
+        quirks_database_path=arguments.quirks_database_path,
+        coverage_path=arguments.coverage_path,
+        breakpoints=arguments.breakpoints,
+        conditions=arguments.conditions,
+        watchpoints=arguments.watchpoints
+    )
+    app.start(arguments.rom_path)
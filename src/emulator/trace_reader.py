@@ -0,0 +1,52 @@
+import importlib.util
+import os
+import sys
+
+from main import Memory, Display, Inputs, CPU, read_trace
+
+TraceReader_CompilerPath = os.path.join(os.path.dirname(__file__), "..", "compiler", "main.py")
+
+def load_compiler():
+    spec = importlib.util.spec_from_file_location("chip8_compiler", TraceReader_CompilerPath)
+    compiler = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(compiler)
+    return compiler
+
+class Disassembler:
+    _dispatch: list
+    _mnemonics: dict[int, tuple[str, list]]
+    _param_type: object
+
+    def __init__(self):
+        compiler = load_compiler()
+        self._param_type = compiler.ParamType
+        self._mnemonics = {node.code: (name, node.param_types) for name, node in compiler.TokensMap.items()}
+        self._dispatch = CPU(Memory(), Display(), Inputs()).get_opcode_table().get_dispatch()
+
+    def _format_param(self, param_type, opcode: int) -> str:
+        match param_type:
+            case self._param_type.VX:
+                return f"v{(opcode & 0x0F00) >> 8}"
+            case self._param_type.VY:
+                return f"v{(opcode & 0x00F0) >> 4}"
+            case self._param_type.N:
+                return hex(opcode & 0x000F)
+            case self._param_type.NN:
+                return hex(opcode & 0x00FF)
+            case self._param_type.NNN:
+                return hex(opcode & 0x0FFF)
+
+    def disassemble(self, opcode: int) -> str:
+        entry = self._dispatch[opcode]
+        if entry is None or entry.id not in self._mnemonics:
+            return f"DATA {hex(opcode)}"
+        name, param_types = self._mnemonics[entry.id]
+        params = [self._format_param(param_type, opcode) for param_type in param_types]
+        return f"{name} {', '.join(params)}".rstrip()
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        raise Exception("[ArgumentError] a trace file is required")
+    disassembler = Disassembler()
+    for pc, opcode in read_trace(sys.argv[1]):
+        print(f"{pc:#06x}: {opcode:04x}  {disassembler.disassemble(opcode)}")